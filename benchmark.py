@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Times the minimax implementations on a fixed set of positions, so that
+# Table 1 of the README can be regenerated and regressions in the search
+# show up as numbers:
+#
+#   python benchmark.py --engines serial,parallel --depths 3,4,5,6
+#   python benchmark.py --engines numba,pool --depths 8,10 --workers 1,2,4,8
+#   python benchmark.py --engines numba --depths 6,8,10 --ordering static,history
+#
+# Positions are made by playing random moves from a seed, for the opening,
+# the middle game and the endgame. Each row gives, for one engine, number of
+# workers, move ordering, depth and phase, the mean time per move, nodes
+# visited and per second, the speedup over the baseline engine (with the
+# first ordering) at the same depth and phase, and the parallel efficiency
+# T1 / (n * Tn) of n workers against the same engine with one worker, for
+# the pool engine when --workers includes 1. Positions never have a winning
+# move for the side to move, which the pool would play without a search; an
+# efficiency above 1 is still printed but flagged in the note column.
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+
+from connectfour.bitboard import HUMAN, AI, Position
+from connectfour.engine import make_searcher, warm_up
+
+PHASES = (("opening", 4), ("midgame", 16), ("endgame", 28))
+
+# serial and parallel are the minimax() of the two scripts (parallel with
+# one worker per CPU), python, numba and numpy the single process engines and
+# pool the process pool search
+ENGINES = ("serial", "parallel", "python", "numba", "numpy", "pool")
+
+# Move orderings below the root: static is the table move then center first,
+# history adds killer moves and the history heuristic. Only the python, numba
+# and pool engines have both; the others always run as static.
+ORDERINGS = ("static", "history")
+ORDERED = ("python", "numba", "pool")
+
+# Positions where the computer is to move, none of them already won or with
+# a winning move: ParallelSearcher plays those without searching, while the
+# single process engines search them like any other, so times would not
+# compare the same work
+def make_positions(seed, count):
+    rng = random.Random(seed)
+    positions = []
+    for phase, moves in PHASES:
+        made = 0
+        while made < count:
+            position = Position(player=AI if moves % 2 == 0 else HUMAN)
+            for _ in range(moves):
+                col = rng.choice(position.legal_moves())
+                if position.is_winning_move(col):
+                    break
+                position.play(col)
+            else:
+                if not any(position.is_winning_move(col)
+                           for col in position.legal_moves()):
+                    positions.append((phase, position))
+                    made += 1
+    return positions
+
+# Returns (search, close): search(position, depth) plays one computer move
+# and returns the nodes visited, or None when the engine does not count them
+def make_engine(name, workers, tt_mb, ordering="history"):
+    heuristics = ordering == "history"
+    if name == "serial":
+        import serial_connectfour
+        def search(position, depth):
+            serial_connectfour.minimax(position.to_array(), depth, True)
+        return search, lambda: None
+    if name == "parallel":
+        import parallel_connectfour
+        searcher = parallel_connectfour.game_searcher()
+        # Start the workers and load the kernel in each of them
+        searcher.search(Position(), 4)
+        def search(position, depth):
+            # The workers' tables cannot be cleared from here: entries of
+            # earlier positions are aged instead
+            searcher.new_search()
+            parallel_connectfour.minimax(position.to_array(), depth, True)
+            return searcher.nodes
+        return search, searcher.close
+    if name == "pool":
+        # One worker is the plain numba searcher, the base of the efficiency
+        searcher = make_searcher("numba", tt_mb=tt_mb, workers=workers,
+                                 heuristics=heuristics)
+        # Start the workers and load the kernel in each of them
+        searcher.search(Position(), 4)
+    else:
+        searcher = make_searcher(name, tt_mb=tt_mb, heuristics=heuristics)
+        warm_up(name)
+    def search(position, depth):
+        if getattr(searcher, "tt", None) is not None:
+            searcher.tt.clear()
+        # Killers and history learned on other positions are aged, as
+        # between the moves of a game
+        searcher.new_search()
+        return searcher.search(position, depth).nodes
+    return search, getattr(searcher, "close", lambda: None)
+
+def _worker_counts(name, workers):
+    if name == "pool":
+        return workers
+    if name == "parallel":
+        return [os.cpu_count()]
+    return [1]
+
+# Efficiencies above this are reported with a note: n workers should not do
+# better than n times one, so such a row measured something else, such as
+# a table or timing effect
+SUPERLINEAR = 1.0
+
+def run(engines, depths, workers, positions, baseline, tt_mb,
+        orderings=("history",), log=sys.stderr):
+    rows = []
+    for name in engines:
+        for count, ordering in [(count, ordering)
+                                for count in _worker_counts(name, workers)
+                                for ordering in (orderings if name in ORDERED
+                                                 else ["static"])]:
+            search, close = make_engine(name, count, tt_mb, ordering)
+            try:
+                for depth in depths:
+                    times = {}
+                    nodes = {}
+                    for phase, position in positions:
+                        start = time.perf_counter()
+                        visited = search(position.copy(), depth)
+                        times.setdefault(phase, []).append(time.perf_counter() - start)
+                        if visited is not None:
+                            nodes[phase] = nodes.get(phase, 0) + visited
+                    for phase, _ in PHASES:
+                        elapsed = times[phase]
+                        row = {"engine": name, "workers": count,
+                               "ordering": ordering, "depth": depth,
+                               "phase": phase, "positions": len(elapsed),
+                               "time_per_move": sum(elapsed) / len(elapsed),
+                               "nodes": nodes.get(phase),
+                               "nodes_per_sec": None}
+                        if phase in nodes:
+                            row["nodes_per_sec"] = nodes[phase] / sum(elapsed)
+                        rows.append(row)
+                        print("%-8s workers=%-3d %-7s depth=%-2d %-8s %.4f s/move"
+                              % (name, count, ordering, depth, phase,
+                                 row["time_per_move"]), file=log)
+            finally:
+                close()
+    base = {}
+    single = {}
+    for row in rows:
+        if row["engine"] == baseline:
+            base.setdefault((row["depth"], row["phase"]), row["time_per_move"])
+        if row["workers"] == 1:
+            single[row["engine"], row["ordering"], row["depth"],
+                   row["phase"]] = row["time_per_move"]
+    for row in rows:
+        reference = base.get((row["depth"], row["phase"]))
+        row["speedup"] = row["efficiency"] = row["note"] = None
+        if reference is not None:
+            row["speedup"] = reference / row["time_per_move"]
+        one = single.get((row["engine"], row["ordering"], row["depth"],
+                          row["phase"]))
+        if one is not None and row["engine"] == "pool":
+            row["efficiency"] = one / (row["workers"] * row["time_per_move"])
+            if row["efficiency"] > SUPERLINEAR:
+                row["note"] = "superlinear"
+                print("warning: pool workers=%d depth=%d %s has efficiency "
+                      "%.2f, above 1" % (row["workers"], row["depth"],
+                                         row["phase"], row["efficiency"]),
+                      file=log)
+    return rows
+
+def write(rows, output, fmt):
+    if fmt == "json":
+        json.dump(rows, output, indent=2)
+        output.write("\n")
+        return
+    writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the minimax engines")
+    parser.add_argument("--engines", default="serial,parallel",
+                        help="comma separated, among %s (default: %%(default)s)"
+                             % ",".join(ENGINES))
+    parser.add_argument("--depths", default="3,4,5",
+                        help="comma separated search depths (default: %(default)s)")
+    parser.add_argument("--workers", default="2,4",
+                        help="comma separated worker counts for the pool engine "
+                             "(default: %(default)s)")
+    parser.add_argument("--positions", type=int, default=3,
+                        help="positions per game phase (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the random positions (default: %(default)s)")
+    parser.add_argument("--baseline", default="serial",
+                        help="engine the speedups are relative to (default: %(default)s)")
+    parser.add_argument("--ordering", default="history",
+                        help="comma separated move orderings, among %s "
+                             "(default: %%(default)s)" % ",".join(ORDERINGS))
+    parser.add_argument("--tt-mb", type=float, default=64,
+                        help="transposition table size in MiB (default: %(default)s)")
+    parser.add_argument("--format", choices=("csv", "json"), default="csv")
+    parser.add_argument("--output", help="file to write, standard output by default")
+    args = parser.parse_args(argv)
+    engines = args.engines.split(",")
+    for name in engines:
+        if name not in ENGINES:
+            parser.error("unknown engine %r" % name)
+    orderings = args.ordering.split(",")
+    for ordering in orderings:
+        if ordering not in ORDERINGS:
+            parser.error("unknown ordering %r" % ordering)
+    depths = [int(depth) for depth in args.depths.split(",")]
+    workers = [int(count) for count in args.workers.split(",")]
+    positions = make_positions(args.seed, args.positions)
+    rows = run(engines, depths, workers, positions, args.baseline, args.tt_mb,
+               orderings)
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            write(rows, output, args.format)
+    else:
+        write(rows, sys.stdout, args.format)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Connect Four engine. Names are imported from their modules on first use, so
+# importing the package loads neither NumPy nor numba.
+import importlib
+
+_EXPORTS = {
+    "ROWS": "bitboard", "COLUMNS": "bitboard", "EMPTY": "bitboard",
+    "HUMAN": "bitboard", "AI": "bitboard", "Position": "bitboard",
+    "variant": "bitboard",
+    "minimax": "search", "alphabeta": "search", "Searcher": "search",
+    "SearchResult": "search", "SearchTimeout": "search",
+    "SearchStats": "search",
+    "TranspositionTable": "tt",
+    "ParallelSearcher": "parallel",
+    "Book": "book",
+    "analyze": "analysis",
+    "GameFile": "records", "GameWriter": "records",
+    "Solver": "solver",
+    "best_move": "engine", "make_searcher": "engine", "warm_up": "engine",
+    "Session": "engine",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+# Batch analysis of recorded positions. Positions are read from a file or
+# standard input as a stream, searched in chunks on a process pool, and one
+# record per position is written as soon as its chunk is back, in input
+# order. Only a few chunks per worker are held at any time, so memory does
+# not grow with the input.
+#
+#   python -m connectfour.analysis games.txt --depth 10 --backend numba
+#   python -m connectfour.analysis boards.bin --input-format packed \
+#       --output-format binary --output analysis.bin
+#
+# Input positions are either lines of the columns played from the empty
+# board, numbered from 1 as for Position.from_moves() ("4453"), packed
+# boards: pairs of little endian uint64, the current and mask bitboards of
+# Position (BOARD), or every position in which a move was played in the
+# games of a records.GameWriter file, whose moves are then those from the
+# start of the game. Each record gives the index of the position in the
+# input, its key, and the move (from 0), value, depth and nodes of
+# engine.best_move(); the move is null, or -1, when the game is over. JSON
+# lines also give the moves of the input line. Binary output is a header of
+# magic and version (16 bytes) followed by one RECORD per position, and is
+# read back with read_records().
+import argparse
+import collections
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .bitboard import HUMAN, AI, BOARD_MASK, BOTTOM, Position, popcount
+from .engine import DEPTH, SOLVE_EMPTY, best_move, init_worker, worker_state
+
+BOARD = np.dtype([("current", "<u8"), ("mask", "<u8")])
+RECORD = np.dtype([("index", "<u8"), ("key", "<u8"), ("nodes", "<u8"),
+                   ("value", "<i4"), ("depth", "i1"), ("move", "i1")])
+
+MAGIC = b"C4EVAL\0\0"
+VERSION = 1
+HEADER = struct.Struct("<8sH6x")
+
+# (index, moves, position) of every line of move strings, index counting the
+# lines from 0. A blank line is the empty board; invalid lines are reported
+# to `log` and skipped.
+def read_moves(lines, log=None):
+    for index, line in enumerate(lines):
+        moves = line.strip()
+        try:
+            position = Position.from_moves(moves)
+        except ValueError as error:
+            if log is not None:
+                print("line %d: %s" % (index + 1, error), file=log)
+            continue
+        yield index, moves, position
+
+# (index, None, position) of every packed board of a binary stream, read
+# `count` boards at a time, index counting the boards from 0. Boards that
+# no game can reach, or where the game is over, are reported to `log` and
+# skipped.
+def read_packed(stream, count=4096, log=None):
+    index = 0
+    while True:
+        data = stream.read(count * BOARD.itemsize)
+        if len(data) % BOARD.itemsize:
+            raise ValueError("packed input ends inside a board")
+        if not data:
+            return
+        for current, mask in np.frombuffer(data, BOARD).tolist():
+            error = _board_error(current, mask)
+            if error is None:
+                moves = popcount(mask)
+                yield index, None, Position(current, mask, moves,
+                                            HUMAN if moves % 2 == 0 else AI)
+            elif log is not None:
+                print("board %d: %s" % (index + 1, error), file=log)
+            index += 1
+
+# Why the packed board is not a position of a game that goes on, or None
+def _board_error(current, mask):
+    if mask & ~BOARD_MASK:
+        return "pieces outside the board"
+    if current & ~mask:
+        return "pieces of the player to move on empty cells"
+    # Adding the bottom cells carries through a column's pieces only when
+    # they are stacked from its bottom
+    if (mask + BOTTOM) & mask:
+        return "pieces above an empty cell"
+    moves = popcount(mask)
+    if popcount(current) != moves // 2:
+        return "%d pieces of the player to move after %d moves" % (
+            popcount(current), moves)
+    position = Position(current, mask, moves)
+    if position.has_won(HUMAN) or position.has_won(AI):
+        return "game is won"
+    if position.is_full():
+        return "board is full"
+    return None
+
+# (index, moves, position) before every move of the games of a
+# records.GameFile, index counting those positions from 0
+def read_games(games):
+    index = 0
+    for game in range(len(games)):
+        for moves, position in games.positions(game):
+            if len(moves) == games.plies[game]:
+                break
+            yield index, "".join(str(col + 1) for col in moves), position.copy()
+            index += 1
+
+# SearchResults of the positions of one chunk. The tables start empty for
+# every chunk, so that results do not depend on which worker got it.
+def _analyze(positions, depth, movetime_ms, solve_empty):
+    searcher, solver, book = worker_state()
+    if searcher.tt is not None:
+        searcher.tt.clear()
+    solver.tt.clear()
+    results = []
+    for position in positions:
+        searcher.new_search()
+        result = best_move(position, depth, movetime_ms, searcher=searcher,
+                           book=book, solve_empty=solve_empty, solver=solver)
+        results.append(result._replace(stats=None))
+    return results
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Analyses the (index, moves, position) items and yields, chunk by chunk in
+# input order, lists of (index, moves, key, SearchResult). At most
+# 2 * workers chunks are queued or searched at once, so `items` is consumed
+# no faster than the workers search.
+def analyze(items, depth=None, movetime_ms=None, workers=None, chunk_size=256,
+            backend="python", tt_mb=64, solve_empty=SOLVE_EMPTY, book=None):
+    if depth is None and movetime_ms is None:
+        depth = DEPTH
+    workers = workers or os.cpu_count()
+    pending = collections.deque()
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(backend, tt_mb, book)) as pool:
+        for chunk in _chunks(items, chunk_size):
+            if len(pending) >= 2 * workers:
+                yield _records(*pending.popleft())
+            future = pool.submit(_analyze, [position for _, _, position in chunk],
+                                 depth, movetime_ms, solve_empty)
+            pending.append((chunk, future))
+        while pending:
+            yield _records(*pending.popleft())
+
+def _records(chunk, future):
+    return [(index, moves, position.key(), result)
+            for (index, moves, position), result in zip(chunk, future.result())]
+
+def write_jsonl(chunks, output):
+    count = 0
+    for records in chunks:
+        lines = []
+        for index, moves, key, result in records:
+            record = {"index": index}
+            if moves is not None:
+                record["moves"] = moves
+            record.update(key=key, move=result.move, value=result.value,
+                          depth=result.depth, nodes=result.nodes)
+            lines.append(json.dumps(record) + "\n")
+        output.write("".join(lines))
+        output.flush()
+        count += len(records)
+    return count
+
+def write_binary(chunks, output):
+    output.write(HEADER.pack(MAGIC, VERSION))
+    count = 0
+    for records in chunks:
+        array = np.array([(index, key, result.nodes, result.value, result.depth,
+                           -1 if result.move is None else result.move)
+                          for index, _, key, result in records], RECORD)
+        output.write(array.tobytes())
+        output.flush()
+        count += len(records)
+    return count
+
+# Records of a binary output file, memory mapped
+def read_records(path):
+    with open(path, "rb") as records:
+        header = records.read(HEADER.size)
+    if len(header) != HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION):
+        raise ValueError("%s is not an analysis file" % path)
+    if os.path.getsize(path) == HEADER.size:
+        return np.zeros(0, RECORD)
+    return np.memmap(path, RECORD, "r", HEADER.size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m connectfour.analysis",
+                                     description="Analyse positions in batch")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file of positions, - for standard input "
+                             "(default: %(default)s)")
+    parser.add_argument("--input-format", choices=("moves", "packed", "games"),
+                        default="moves",
+                        help="lines of moves, packed bitboards or a game "
+                             "record file (default: %(default)s)")
+    parser.add_argument("--output", help="file of records, standard output "
+                                         "by default")
+    parser.add_argument("--output-format", choices=("jsonl", "binary"),
+                        default="jsonl",
+                        help="JSON lines or packed records (default: %(default)s)")
+    parser.add_argument("--depth", type=int,
+                        help="plies searched per position (default: %d, "
+                             "unlimited with --movetime-ms)" % DEPTH)
+    parser.add_argument("--movetime-ms", type=int,
+                        help="search each position deeper and deeper for "
+                             "this many milliseconds")
+    parser.add_argument("--backend", choices=("python", "numba", "numpy"),
+                        default="python",
+                        help="search implementation (default: %(default)s)")
+    parser.add_argument("--tt-mb", type=float, default=64,
+                        help="transposition table size of each worker in MiB "
+                             "(default: %(default)s)")
+    parser.add_argument("--solve-empty", type=int, default=SOLVE_EMPTY,
+                        help="solve positions with at most this many empty "
+                             "cells, 0 to never solve (default: %(default)s)")
+    parser.add_argument("--book", help="opening book used by the workers")
+    parser.add_argument("--workers", type=int,
+                        help="processes searching positions "
+                             "(default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=256,
+                        help="positions sent to a worker at once "
+                             "(default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    source = None
+    if args.input_format == "games":
+        if args.input == "-":
+            parser.error("game record files are mapped, give their path")
+        from .records import GameFile
+        games = GameFile(args.input)
+        if games.board is not Position:
+            parser.error("%s holds games of another board" % args.input)
+        items = read_games(games)
+    elif args.input_format == "packed":
+        source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+        items = read_packed(source, log=sys.stderr)
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input)
+        items = read_moves(source, sys.stderr)
+    if args.output_format == "binary":
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        write = write_binary
+    else:
+        output = open(args.output, "w") if args.output else sys.stdout
+        write = write_jsonl
+    start = time.monotonic()
+    try:
+        count = write(analyze(items, args.depth, args.movetime_ms, args.workers,
+                              args.chunk_size, args.backend, args.tt_mb,
+                              args.solve_empty, args.book), output)
+    finally:
+        if source is not None and args.input != "-":
+            source.close()
+        if args.output:
+            output.close()
+    elapsed = time.monotonic() - start
+    print("%d positions in %.1f s, %.0f positions/s" % (
+        count, elapsed, count / elapsed if elapsed else 0), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Minimax searched breadth first over NumPy arrays. Each ply of the tree is
+# one array of bitboards, generated from the previous one for all columns at
+# once, and the whole frontier is scored with a single evaluate_bitboards()
+# call. Values are then backed up ply by ply with min reductions over the
+# children of each node. There is no pruning, so moves and values are those
+# of search.minimax(). Positions of every variant() of at most 64 bits are
+# searched.
+import time
+
+import numpy as np
+
+from .bitboard import WIN_SCORE, opponent
+from .evaluation import evaluate_bitboards, wins_bitboards
+from .search import SearchResult, SearchTimeout, terminal_result
+
+# Nodes a timed search may hold at once, every ply of the tree being kept
+# until the values are backed up: about 170 bytes each at the peak, so some
+# 350 MiB
+MAX_NODES = 1 << 21
+
+# Negamax values, for the player to move, of the children of a non terminal
+# position, with their columns in increasing order, and the number of nodes
+# generated. `color` is 1 when the player to move is the one whose score()
+# is used at the leaves. With a `deadline`, raises SearchTimeout rather than
+# start a ply, each about COLUMNS times larger than the last, that would
+# not be done in time or would take the tree past MAX_NODES.
+def child_values(position, depth, color, deadline=None):
+    board = type(position)
+    if board.COLUMNS * board.HEIGHT > 64:
+        raise ValueError("the numpy backend plays boards of at most 64 bits")
+    bottoms = np.array(board.BOTTOM_MASKS, np.uint64)
+    tops = np.array(board.TOP_MASKS, np.uint64)
+    currents = np.array([position.current], np.uint64)
+    masks = np.array([position.mask], np.uint64)
+    levels = []
+    nodes = 1
+    start = time.monotonic()
+    for ply in range(depth):
+        if not len(currents):
+            # Every line ended before the frontier
+            break
+        if deadline is not None:
+            now = time.monotonic()
+            estimate = len(currents) * board.COLUMNS
+            # Scoring and backing up the new nodes costs some five times
+            # more than generating them, at the speed measured so far
+            seconds = 6 * estimate * (now - start) / nodes
+            if now + seconds > deadline or nodes + estimate > MAX_NODES:
+                raise SearchTimeout(nodes)
+        legal = (masks[:, None] & tops[None, :]) == 0
+        parents, cols = np.nonzero(legal)
+        parent_masks = masks[parents]
+        children = currents[parents] ^ parent_masks
+        child_masks = parent_masks | (parent_masks + bottoms[cols])
+        # The player that just moved is the only one that can have won
+        won = wins_bitboards(children ^ child_masks, board)
+        values = np.where(won, -WIN_SCORE, 0)
+        if position.moves + ply + 1 == board.CELLS:
+            alive = np.zeros(len(children), bool)
+        else:
+            alive = ~won
+        levels.append((parents, cols, values, alive))
+        currents = children[alive]
+        masks = child_masks[alive]
+        nodes += len(children)
+    # Frontier from the point of view of its player to move
+    if (color == 1) == (depth % 2 == 0):
+        frontier, _ = evaluate_bitboards(currents, masks, board)
+    else:
+        frontier, _ = evaluate_bitboards(currents ^ masks, masks, board)
+        frontier = -frontier
+    for parents, cols, values, alive in reversed(levels[1:]):
+        values[alive] = frontier
+        # Children are grouped by parent, each parent is worth the opposite of
+        # its worst child
+        starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+        frontier = -np.minimum.reduceat(values, starts)
+    _, cols, values, alive = levels[0]
+    values[alive] = frontier
+    return cols, values, nodes
+
+# Same as Searcher.search
+def search(position, depth, deadline=None):
+    result = terminal_result(position, depth)
+    if result is not None:
+        return result
+    cols, values, nodes = child_values(position, depth, 1, deadline)
+    # argmin keeps the leftmost column, like minimax()
+    best = int(np.argmin(values))
+    return SearchResult(int(cols[best]), -int(values[best]), depth, nodes)
+
+# Returns (value, nodes), the exact negamax value, which is also a valid
+# answer for any alpha-beta window
+def value(position, depth, color, deadline=None):
+    if position.has_won(opponent(position.player)):
+        return -WIN_SCORE, 1
+    if position.is_full():
+        return 0, 1
+    if depth == 0:
+        if color == 1:
+            return position.score(position.player), 1
+        return -position.score(opponent(position.player)), 1
+    _, values, nodes = child_values(position, depth, color, deadline)
+    return -int(values.min()), nodes
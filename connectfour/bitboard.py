@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+import functools
+
+ROWS = 6
+COLUMNS = 7
+CONNECT = 4
+EMPTY = 0
+HUMAN = 1
+AI = 2
+
+# Every column takes ROWS + 1 bits, bottom row first. The extra bit on top of
+# each column is always empty so that shifted masks never wrap around into the
+# neighbouring column:
+#
+#   6 13 20 27 34 41 48
+#   5 12 19 26 33 40 47
+#   4 11 18 25 32 39 46
+#   3 10 17 24 31 38 45
+#   2  9 16 23 30 37 44
+#   1  8 15 22 29 36 43
+#   0  7 14 21 28 35 42
+HEIGHT = ROWS + 1
+CELLS = ROWS * COLUMNS
+
+BOTTOM_MASKS = [1 << (col * HEIGHT) for col in range(COLUMNS)]
+TOP_MASKS = [1 << (col * HEIGHT + ROWS - 1) for col in range(COLUMNS)]
+COLUMN_MASKS = [((1 << ROWS) - 1) << (col * HEIGHT) for col in range(COLUMNS)]
+BOTTOM = sum(BOTTOM_MASKS)
+BOARD_MASK = BOTTOM * ((1 << ROWS) - 1)
+
+# Shift between two consecutive cells of a connection: vertical, horizontal,
+# diagonal upwards and diagonal downwards
+DIRECTIONS = (1, HEIGHT, HEIGHT + 1, HEIGHT - 1)
+
+# Center columns are given more weight, same as the array implementation
+CENTER_WEIGHTS = [(COLUMN_MASKS[COLUMNS // 2], 3),
+                  (COLUMN_MASKS[COLUMNS // 2 - 1], 2),
+                  (COLUMN_MASKS[COLUMNS // 2 + 1], 2)]
+
+# Points for a window of CONNECT cells holding only player pieces and empty
+# spaces, indexed by the number of empty spaces in it
+WINDOW_POINTS = (99999, 100, 10)
+
+WIN_SCORE = 1000000000
+
+def opponent(player):
+    return HUMAN if player == AI else AI
+
+def popcount(bits):
+    return bits.bit_count()
+
+# is_win() of a board with the given shifts between consecutive cells: checks
+# if the player bitboard contains `connect` aligned pieces
+def _win_function(directions, connect):
+    def is_win(bits):
+        for shift in directions:
+            aligned = bits
+            for k in range(1, connect):
+                aligned &= bits >> (k * shift)
+            if aligned:
+                return True
+        return False
+    return is_win
+
+# score() of a board with the given masks and shifts: heuristic value of a
+# bitboard for the player owning `bits`
+def _score_function(board_mask, center_weights, directions, connect):
+    def score(bits, mask):
+        empty = board_mask & ~mask
+        total = 0
+        for column, weight in center_weights:
+            total += weight * popcount(bits & column)
+        for shift in directions:
+            pieces = [bits >> (k * shift) for k in range(connect)]
+            spaces = [empty >> (k * shift) for k in range(connect)]
+            # Windows starting at each bit, made only of player pieces
+            full = pieces[0]
+            for k in range(1, connect):
+                full &= pieces[k]
+            total += WINDOW_POINTS[0] * popcount(full)
+            # Exactly one empty space
+            for i in range(connect):
+                window = spaces[i]
+                for k in range(connect):
+                    if k != i:
+                        window &= pieces[k]
+                total += WINDOW_POINTS[1] * popcount(window)
+            # Exactly two empty spaces
+            for i in range(connect):
+                for j in range(i + 1, connect):
+                    window = spaces[i] & spaces[j]
+                    for k in range(connect):
+                        if k != i and k != j:
+                            window &= pieces[k]
+                    total += WINDOW_POINTS[2] * popcount(window)
+        return total
+    return score
+
+# Checks if the given player bitboard contains CONNECT aligned pieces
+is_win = _win_function(DIRECTIONS, CONNECT)
+
+# Heuristic value of a bitboard for the player owning `bits`, equal to score()
+# of the array implementation
+score = _score_function(BOARD_MASK, CENTER_WEIGHTS, DIRECTIONS, CONNECT)
+
+# Center columns first, the same priority score() gives them
+def _move_order(columns):
+    return sorted(range(columns), key=lambda col: abs(columns // 2 - col))
+
+# Position on the standard board. Positions of other boards are instances of
+# the subclasses made by variant(), which override the board attributes
+# below; methods only read the board through them.
+class Position:
+    # `current` holds the pieces of the player to move and `mask` every
+    # occupied cell, so the other player's pieces are current ^ mask
+    __slots__ = ("current", "mask", "moves", "player")
+
+    ROWS = ROWS
+    COLUMNS = COLUMNS
+    CONNECT = CONNECT
+    HEIGHT = HEIGHT
+    CELLS = CELLS
+    BOTTOM_MASKS = BOTTOM_MASKS
+    TOP_MASKS = TOP_MASKS
+    COLUMN_MASKS = COLUMN_MASKS
+    BOARD_MASK = BOARD_MASK
+    DIRECTIONS = DIRECTIONS
+    CENTER_WEIGHTS = CENTER_WEIGHTS
+    MOVE_ORDER = _move_order(COLUMNS)
+    # (rows, columns, connect), as given to variant()
+    VARIANT = (ROWS, COLUMNS, CONNECT)
+    _is_win = staticmethod(is_win)
+    _score = staticmethod(score)
+
+    def __init__(self, current=0, mask=0, moves=0, player=HUMAN):
+        self.current = current
+        self.mask = mask
+        self.moves = moves
+        self.player = player
+
+    # Variant classes are made at run time, so positions are pickled by
+    # their variant
+    def __reduce__(self):
+        return (_position, (self.VARIANT, self.current, self.mask, self.moves,
+                            self.player))
+
+    def copy(self):
+        return type(self)(self.current, self.mask, self.moves, self.player)
+
+    def can_play(self, col):
+        return not self.mask & self.TOP_MASKS[col]
+
+    def legal_moves(self):
+        return [col for col in range(self.COLUMNS) if self.can_play(col)]
+
+    def play(self, col):
+        self.current ^= self.mask
+        self.mask |= self.mask + self.BOTTOM_MASKS[col]
+        self.moves += 1
+        self.player = opponent(self.player)
+
+    # Takes back the top piece of the column, which must be the last move
+    def undo(self, col):
+        stack = self.mask & self.COLUMN_MASKS[col]
+        self.mask ^= (stack + self.BOTTOM_MASKS[col]) >> 1
+        self.current ^= self.mask
+        self.moves -= 1
+        self.player = opponent(self.player)
+
+    # Checks if the player to move wins by playing col
+    def is_winning_move(self, col):
+        drop = (self.mask + self.BOTTOM_MASKS[col]) & self.COLUMN_MASKS[col]
+        return self._is_win(self.current | drop)
+
+    def stones(self, player):
+        if player == self.player:
+            return self.current
+        return self.current ^ self.mask
+
+    def has_won(self, player):
+        return self._is_win(self.stones(player))
+
+    def is_full(self):
+        return self.moves == self.CELLS
+
+    def score(self, player):
+        return self._score(self.stones(player), self.mask)
+
+    # Unique number for the position, from the point of view of the player
+    # to move
+    def key(self):
+        return self.current + self.mask
+
+    # Position of the given key(). Every column of the key holds its pieces
+    # plus its filled cells, from 2 ** h - 1 to 2 ** (h + 1) - 2 for h pieces,
+    # so the height is read from the highest bit. The player to move is HUMAN
+    # after an even number of moves unless `player` is given.
+    @classmethod
+    def from_key(cls, key, player=None):
+        mask = 0
+        moves = 0
+        full = (1 << cls.HEIGHT) - 1
+        for col in range(cls.COLUMNS):
+            shift = col * cls.HEIGHT
+            height = (((key >> shift) & full) + 1).bit_length() - 1
+            mask |= ((1 << height) - 1) << shift
+            moves += height
+        if player is None:
+            player = HUMAN if moves % 2 == 0 else AI
+        return cls(key - mask, mask, moves, player)
+
+    @classmethod
+    def from_array(cls, board, player):
+        position = cls(player=player)
+        rows, height = cls.ROWS, cls.HEIGHT
+        for row in range(rows):
+            for col in range(cls.COLUMNS):
+                piece = board[row][col]
+                if piece == EMPTY:
+                    continue
+                bit = 1 << (col * height + rows - 1 - row)
+                position.mask |= bit
+                position.moves += 1
+                if piece == player:
+                    position.current |= bit
+        return position
+
+    # Position after the given columns, numbered from 1 as typed in the game
+    # (e.g. "4453"), were played alternately starting with `first`
+    @classmethod
+    def from_moves(cls, moves, first=HUMAN):
+        position = cls(player=first)
+        for move in moves:
+            col = int(move) - 1
+            if not 0 <= col < cls.COLUMNS or not position.can_play(col):
+                raise ValueError("invalid move %r" % move)
+            position.play(col)
+        return position
+
+    # Board in the layout of create_board(), top row first. NumPy is only
+    # imported here, so that positions alone do not load it.
+    def to_array(self):
+        import numpy as np
+        rows, height = self.ROWS, self.HEIGHT
+        board = np.zeros((rows, self.COLUMNS), np.int8)
+        other = opponent(self.player)
+        for row in range(rows):
+            for col in range(self.COLUMNS):
+                bit = 1 << (col * height + rows - 1 - row)
+                if self.current & bit:
+                    board[row][col] = self.player
+                elif self.mask & bit:
+                    board[row][col] = other
+        return board
+
+    def __repr__(self):
+        return "%s(current=%#x, mask=%#x, moves=%d, player=%d)" % (
+            type(self).__name__, self.current, self.mask, self.moves,
+            self.player)
+
+# Position class of a board of `rows` by `columns` cells won with `connect`
+# aligned pieces. Its masks, shifts and score() are computed on the first
+# call and the class is kept for later ones; the standard board gives
+# Position itself.
+def variant(rows=ROWS, columns=COLUMNS, connect=CONNECT):
+    return _variant(rows, columns, connect)
+
+@functools.lru_cache(maxsize=None)
+def _variant(rows, columns, connect):
+    if (rows, columns, connect) == Position.VARIANT:
+        return Position
+    if rows < 1 or columns < 3 or connect < 3 or connect > max(rows, columns):
+        raise ValueError("no %dx%d board with connect %d" % (columns, rows,
+                                                            connect))
+    if rows * columns > 127:
+        # Depths and moves are stored in int8 by the transposition table
+        raise ValueError("boards have at most 127 cells")
+    height = rows + 1
+    bottom_masks = [1 << (col * height) for col in range(columns)]
+    column_masks = [((1 << rows) - 1) << (col * height) for col in range(columns)]
+    board_mask = sum(bottom_masks) * ((1 << rows) - 1)
+    directions = (1, height, height + 1, height - 1)
+    center_weights = [(column_masks[columns // 2], 3),
+                      (column_masks[columns // 2 - 1], 2),
+                      (column_masks[columns // 2 + 1], 2)]
+    attributes = {
+        "__slots__": (),
+        "ROWS": rows, "COLUMNS": columns, "CONNECT": connect,
+        "HEIGHT": height, "CELLS": rows * columns,
+        "BOTTOM_MASKS": bottom_masks,
+        "TOP_MASKS": [1 << (col * height + rows - 1) for col in range(columns)],
+        "COLUMN_MASKS": column_masks, "BOARD_MASK": board_mask,
+        "DIRECTIONS": directions, "CENTER_WEIGHTS": center_weights,
+        "MOVE_ORDER": _move_order(columns),
+        "VARIANT": (rows, columns, connect),
+        "_is_win": staticmethod(_win_function(directions, connect)),
+        "_score": staticmethod(_score_function(board_mask, center_weights,
+                                               directions, connect)),
+    }
+    return type("Position%dx%dc%d" % (columns, rows, connect), (Position,),
+                attributes)
+
+def _position(board, current, mask, moves, player):
+    return variant(*board)(current, mask, moves, player)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Opening book: the searched best move and value of every position of the
+# first plies, in a binary file sorted by position key. Books are opened with
+# np.memmap and probed by binary search, so opening one reads nothing but the
+# header and a probe only touches the pages it looks at.
+#
+# File layout, little endian:
+#
+#   header   magic, version, ROWS, COLUMNS, plies, depth, count (32 bytes)
+#   keys     count x uint64, increasing
+#   values   count x int32
+#   moves    count x int8
+#
+# Keys are Position.key(), values are for the player to move, as returned by
+# Searcher.search(). Build a book with
+#
+#   python -m connectfour.book book.bin --plies 6 --depth 10 --backend numba
+#
+# or, with --games, from the positions of the first plies of recorded games
+# (a records.GameWriter file) instead of every position.
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from .bitboard import ROWS, COLUMNS, Position, opponent
+from .search import SearchResult
+
+MAGIC = b"C4BOOK\0\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHHHQ6x")
+
+class Book:
+    def __init__(self, path):
+        with open(path, "rb") as book:
+            header = book.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("%s is not an opening book" % path)
+        magic, version, rows, columns, plies, depth, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not an opening book" % path)
+        if (rows, columns) != (ROWS, COLUMNS):
+            raise ValueError("%s is a book for a %dx%d board" % (path, rows, columns))
+        self.path = path
+        self.plies = plies
+        self.depth = depth
+        self.count = count
+        if count:
+            offset = HEADER.size
+            self.keys = np.memmap(path, np.uint64, "r", offset, (count,))
+            offset += 8 * count
+            self.values = np.memmap(path, np.int32, "r", offset, (count,))
+            offset += 4 * count
+            self.moves = np.memmap(path, np.int8, "r", offset, (count,))
+        else:
+            self.keys = np.zeros(0, np.uint64)
+            self.values = np.zeros(0, np.int32)
+            self.moves = np.zeros(0, np.int8)
+
+    def __len__(self):
+        return self.count
+
+    # SearchResult stored for the position, or None when it is not in the book
+    def probe(self, position):
+        if position.moves > self.plies:
+            return None
+        key = np.uint64(position.key())
+        index = int(np.searchsorted(self.keys, key))
+        if index == self.count or self.keys[index] != key:
+            return None
+        return SearchResult(int(self.moves[index]), int(self.values[index]),
+                            self.depth, 0)
+
+# Every position of at most `plies` moves in which the game is not over, once
+def book_positions(plies):
+    frontier = [Position()]
+    for ply in range(plies + 1):
+        children = {}
+        for position in frontier:
+            yield position
+            if ply == plies or position.moves + 1 == ROWS * COLUMNS:
+                continue
+            for col in position.legal_moves():
+                if position.is_winning_move(col):
+                    continue
+                child = position.copy()
+                child.play(col)
+                children.setdefault(child.key(), child)
+        frontier = list(children.values())
+
+# Positions of at most `plies` moves in the games of a records.GameFile in
+# which the game is not over, once
+def game_positions(games, plies):
+    seen = set()
+    for game in range(len(games)):
+        for _, position in games.positions(game):
+            if position.moves > plies:
+                break
+            if position.has_won(opponent(position.player)) or position.is_full():
+                break
+            if position.key() not in seen:
+                seen.add(position.key())
+                yield position.copy()
+
+# Searches every position of the first `plies` moves, or the given
+# `positions`, to `depth` and writes the book to `path`. The table is
+# cleared between positions, so that a book only depends on its positions
+# and depth.
+def generate(path, plies, depth, searcher, log=None, positions=None):
+    keys = []
+    values = []
+    moves = []
+    start = time.monotonic()
+    if positions is None:
+        positions = book_positions(plies)
+    for position in positions:
+        if getattr(searcher, "tt", None) is not None:
+            searcher.tt.clear()
+        result = searcher.search(position, depth)
+        keys.append(position.key())
+        values.append(result.value)
+        moves.append(result.move)
+        if log is not None and len(keys) % 1000 == 0:
+            print("%d positions, %.1f s" % (len(keys), time.monotonic() - start),
+                  file=log)
+    keys = np.array(keys, np.uint64)
+    order = np.argsort(keys)
+    with open(path, "wb") as book:
+        book.write(HEADER.pack(MAGIC, VERSION, ROWS, COLUMNS, plies, depth,
+                               len(keys)))
+        book.write(keys[order].astype("<u8").tobytes())
+        book.write(np.array(values, "<i4")[order].tobytes())
+        book.write(np.array(moves, np.int8)[order].tobytes())
+    return len(keys)
+
+def main(argv=None):
+    from .engine import make_searcher, warm_up
+    parser = argparse.ArgumentParser(prog="python -m connectfour.book",
+                                     description="Generate an opening book")
+    parser.add_argument("path", help="book file to write")
+    parser.add_argument("--plies", type=int, default=4,
+                        help="moves covered by the book (default: %(default)s)")
+    parser.add_argument("--depth", type=int, default=10,
+                        help="plies searched from each position "
+                             "(default: %(default)s)")
+    parser.add_argument("--backend", choices=("python", "numba", "numpy"),
+                        default="numba",
+                        help="search implementation (default: %(default)s)")
+    parser.add_argument("--tt-mb", type=float, default=64,
+                        help="transposition table size in MiB "
+                             "(default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes searching each position "
+                             "(default: %(default)s)")
+    parser.add_argument("--games",
+                        help="only cover the positions of the games of this "
+                             "game record file")
+    args = parser.parse_args(argv)
+    positions = None
+    if args.games:
+        from .records import GameFile
+        games = GameFile(args.games)
+        if games.board is not Position:
+            parser.error("%s holds games of another board" % args.games)
+        positions = game_positions(games, args.plies)
+    searcher = make_searcher(args.backend, tt_mb=args.tt_mb, workers=args.workers)
+    warm_up(args.backend)
+    start = time.monotonic()
+    try:
+        count = generate(args.path, args.plies, args.depth, searcher,
+                         sys.stderr, positions)
+    finally:
+        if hasattr(searcher, "close"):
+            searcher.close()
+    print("%d positions written to %s in %.1f s (%d bytes)" % (
+        count, args.path, time.monotonic() - start, os.path.getsize(args.path)))
+
+if __name__ == "__main__":
+    main()
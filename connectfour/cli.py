@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import argparse
+import time
+import random
+
+from .bitboard import ROWS, COLUMNS, CONNECT, HUMAN, AI, variant
+from .book import Book
+from .engine import DEPTH, SOLVE_EMPTY, Session, warm_up
+from .ui import draw_game
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m connectfour",
+                                     description="Play Connect Four against minimax")
+    parser.add_argument("--depth", type=int,
+                        help="plies searched per computer move (default: %d, "
+                             "unlimited with --movetime-ms)" % DEPTH)
+    parser.add_argument("--movetime-ms", type=int,
+                        help="search deeper and deeper until this many "
+                             "milliseconds have passed")
+    parser.add_argument("--tt-mb", type=float, default=64,
+                        help="transposition table size in MiB, 0 to disable "
+                             "(default: %(default)s)")
+    parser.add_argument("--backend", choices=("python", "numba", "numpy"),
+                        default="python",
+                        help="search implementation (default: %(default)s)")
+    parser.add_argument("--eval", choices=("bitboard", "incremental"),
+                        help="leaf evaluation (default: incremental with the "
+                             "python backend, bitboard otherwise)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes searching the root moves in parallel "
+                             "(default: %(default)s)")
+    parser.add_argument("--split-ply", type=int, choices=(1, 2), default=1,
+                        help="ply whose subtrees are given to the workers "
+                             "(default: %(default)s)")
+    parser.add_argument("--solve-empty", type=int, default=SOLVE_EMPTY,
+                        help="solve the game exactly once this many cells are "
+                             "empty, 0 to never solve (default: %(default)s)")
+    parser.add_argument("--trace",
+                        help="append the search statistics of every computer "
+                             "move to this file, as JSON lines")
+    parser.add_argument("--book",
+                        help="opening book made by python -m connectfour.book")
+    parser.add_argument("--record",
+                        help="save the game to this game record file")
+    parser.add_argument("--rows", type=int, default=ROWS,
+                        help="rows of the board (default: %(default)s)")
+    parser.add_argument("--columns", type=int, default=COLUMNS,
+                        help="columns of the board, at most 9 "
+                             "(default: %(default)s)")
+    parser.add_argument("--connect", type=int, default=CONNECT,
+                        help="aligned pieces that win (default: %(default)s)")
+    parser.add_argument("--ponder", choices=("off", "expected", "all"),
+                        default="off",
+                        help="keep searching while you think: the reply the "
+                             "computer expects, or every reply "
+                             "(default: %(default)s)")
+    parser.add_argument("--seed", type=int,
+                        help="draw who starts and the computer's choice among "
+                             "equally good moves from this seed, so that games "
+                             "can be replayed (default: random start, leftmost "
+                             "of equally good moves)")
+    args = parser.parse_args(argv)
+    if args.depth is not None and args.depth < 1:
+        parser.error("--depth must be at least 1")
+    if args.trace and args.workers > 1:
+        parser.error("--trace needs a single worker")
+    if args.backend != "python" and args.eval == "incremental":
+        parser.error("the %s backend only has the bitboard evaluation"
+                     % args.backend)
+    try:
+        args.board = variant(args.rows, args.columns, args.connect)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.record and args.board.HEIGHT * args.columns > 64:
+        parser.error("games of boards over 64 bits cannot be recorded")
+    if args.columns > 9:
+        parser.error("columns are typed as a single digit, give at most 9")
+    if args.backend != "python" and args.board.HEIGHT * args.columns > 64:
+        parser.error("the %s backend plays boards of at most 64 bits"
+                     % args.backend)
+    if (args.rows, args.columns, args.connect) != (ROWS, COLUMNS, CONNECT):
+        if args.book:
+            parser.error("the opening book is for the standard board")
+    return args
+
+# Writes the columns played to the --record file, if any
+def save_game(args, played):
+    if args.record:
+        from .records import GameWriter
+        with GameWriter(args.record, args.board) as games:
+            games.add(played)
+
+# Same game as serial_connectfour.py, played by the bitboard engine
+def main(argv=None):
+    args = parse_args(argv)
+    trace = open(args.trace, "a") if args.trace else None
+    book = Book(args.book) if args.book else None
+    session = Session(book, args.solve_empty, backend=args.backend,
+                      evaluation=args.eval, tt_mb=args.tt_mb,
+                      workers=args.workers, split_ply=args.split_ply,
+                      seed=args.seed, trace=trace)
+    warm_up(args.backend)
+    position = args.board(player=random.Random(args.seed).choice([HUMAN, AI]))
+    is_game_won = False
+    AI_move = -1
+    running_time = 0
+    draw_game(position.to_array(), position.player)
+    total_moves = 0
+    minimax_times = []
+    played = []
+    while not is_game_won and not position.is_full():
+        total_moves += 1
+        turn = position.player
+        if turn == HUMAN:
+            # Take user input
+            pressed_key = input()
+            try:
+                pressed_key = int(pressed_key)
+            except ValueError:
+                pass
+            # If typed 1 to 7
+            if pressed_key in range(1, position.COLUMNS + 1) and \
+                    position.can_play(pressed_key - 1):
+                is_game_won = position.is_winning_move(pressed_key - 1)
+                position.play(pressed_key - 1)
+                played.append(pressed_key - 1)
+                if is_game_won:
+                    draw_game(position.to_array(), turn, game_over=True,
+                              running_time=running_time)
+                    break
+                draw_game(position.to_array(), position.player,
+                          running_time=running_time)
+            # If player chooses to quit game
+            elif pressed_key == "q":
+                session.close()
+                save_game(args, played)
+                print("\033c") # Clear screen
+                print("\nThank you for playing!")
+                return
+            # Invalid input
+            else:
+                total_moves -= 1
+                print("\nInvalid input, try again...")
+                time.sleep(1)
+                draw_game(position.to_array(), turn, AI_move=AI_move,
+                          running_time=running_time)
+        else:
+            initial_time = time.time()
+            col = session.best_move(position, args.depth, args.movetime_ms).move
+            is_game_won = position.is_winning_move(col)
+            position.play(col)
+            played.append(col)
+            AI_move = col + 1
+            running_time = time.time() - initial_time
+            minimax_times.append(running_time)
+            if is_game_won:
+                draw_game(position.to_array(), turn, game_over=True,
+                          AI_move=AI_move, running_time=running_time)
+                break
+            draw_game(position.to_array(), position.player, AI_move=AI_move,
+                      running_time=running_time)
+            if args.ponder != "off":
+                session.ponder(position, args.ponder, args.depth)
+    session.close()
+    save_game(args, played)
+    if minimax_times:
+        running_time = sum(minimax_times) / len(minimax_times)
+        print("                    Thank you for playing!")
+        print("          Average minimax running time: %.4f seconds" % running_time)
+        print("                   Total number of moves: %s" % total_moves)
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Entry points for programs that use the engine without the game. Nothing
+# heavy is imported here: the numba kernel is only loaded, and compiled or
+# read from its cache, by the first search that uses it.
+import threading
+import time
+
+from .bitboard import CELLS, WIN_SCORE, Position
+from .search import Searcher, SearchTimeout
+from .solver import Solver
+from .tt import TranspositionTable
+
+DEPTH = 4
+
+# Positions with at most this many empty cells are solved to the end
+SOLVE_EMPTY = 16
+
+# Pondering searches in slices of this many milliseconds, so that it stops
+# at most that late
+PONDER_SLICE_MS = 50
+
+# Searcher for the given options. evaluation=None picks the fastest one for
+# the backend; tt_mb=0 searches without transposition table; workers > 1
+# starts a process pool, which the caller should close() when done.
+# heuristics=False orders moves statically, without killer moves and
+# history; with a seed, equally good moves are drawn from it instead of the
+# leftmost being played. profile and trace are those of Searcher, for a
+# single process.
+def make_searcher(backend="python", evaluation=None, tt_mb=64, workers=1,
+                  split_ply=1, pruning=True, heuristics=True, seed=None,
+                  profile=False, trace=None):
+    if evaluation is None:
+        evaluation = "incremental" if backend == "python" else "bitboard"
+    if workers > 1:
+        from .parallel import ParallelSearcher
+        return ParallelSearcher(workers, tt_mb, backend, split_ply, evaluation,
+                                heuristics, seed)
+    tt = TranspositionTable(tt_mb) if tt_mb > 0 else None
+    return Searcher(pruning=pruning, tt=tt, backend=backend,
+                    evaluation=evaluation, heuristics=heuristics, seed=seed,
+                    profile=profile, trace=trace)
+
+# Returns the SearchResult of the best move for the player to move in
+# `position`, searched to a fixed depth or, with movetime_ms, as deep as the
+# time allows (then `depth` is the maximum). Pass a `searcher` to keep its
+# table and pool between calls; otherwise one is made from `options`, which
+# are those of make_searcher(). Positions found in `book`, a Book, are
+# answered from it without searching, and those with at most `solve_empty`
+# empty cells are solved exactly by `solver`, a Solver kept between calls
+# like the searcher, or a new one (0 never solves). A solve that outlasts
+# movetime_ms, or the searcher's deadline, gives way to the search.
+def best_move(position, depth=None, movetime_ms=None, searcher=None, book=None,
+              solve_empty=SOLVE_EMPTY, solver=None, **options):
+    deadline = getattr(searcher, "deadline", None)
+    if movetime_ms is not None:
+        deadline = time.monotonic() + movetime_ms / 1000.0
+    result = _lookup(position, book, solve_empty, solver, deadline)
+    if result is not None:
+        return result
+    if movetime_ms is not None:
+        movetime_ms = _remaining_ms(deadline)
+    if searcher is not None:
+        if options:
+            raise TypeError("options cannot be given with a searcher")
+        return _best_move(searcher, position, depth, movetime_ms)
+    searcher = make_searcher(**options)
+    try:
+        return _best_move(searcher, position, depth, movetime_ms)
+    finally:
+        if hasattr(searcher, "close"):
+            searcher.close()
+
+# Answer from the book or the solver, or None when the position needs a search
+# or the solve did not finish by `deadline`. Both only know the standard board.
+def _lookup(position, book, solve_empty, solver=None, deadline=None):
+    if position.VARIANT != Position.VARIANT:
+        return None
+    if book is not None:
+        result = book.probe(position)
+        if result is not None:
+            return result
+    if CELLS - position.moves <= solve_empty:
+        if solver is None:
+            solver = Solver()
+        solver.deadline = deadline
+        try:
+            return solver.solve(position)
+        except SearchTimeout:
+            return None
+        finally:
+            solver.deadline = None
+    return None
+
+# What is left of the time to move when the solver gave up at `deadline`, or
+# less; iterative deepening still searches one ply with 0
+def _remaining_ms(deadline):
+    return max(0, (deadline - time.monotonic()) * 1000)
+
+def _best_move(searcher, position, depth, movetime_ms, pv=None):
+    if movetime_ms is not None:
+        return searcher.iterate(position, movetime_ms, depth, pv)
+    searcher.pv = list(pv) if pv else []
+    return searcher.search(position, DEPTH if depth is None else depth,
+                           pv[0] if pv else None)
+
+# Engine of one game, kept from one move to the next: the searcher with its
+# transposition table, the solver with its own, and the principal variation
+# of the last search. When
+# the game went on as that variation expected, the rest of it is tried first,
+# and every move starts a new table generation, so entries of positions left
+# behind age out while those still ahead are reused. `options` are those of
+# make_searcher(); close() the session when done.
+#
+# While the opponent thinks, ponder() searches the positions their reply can
+# lead to in a background thread, into the same table. If the reply was
+# pondered long enough, to the depth or for the time the move is asked for,
+# best_move() answers at once; otherwise it searches on from the warm table.
+class Session:
+    def __init__(self, book=None, solve_empty=SOLVE_EMPTY, **options):
+        self.searcher = make_searcher(**options)
+        self.book = book
+        self.solve_empty = solve_empty
+        self.solver = Solver() if solve_empty > 0 else None
+        self.root = None
+        self.pv = []
+        # Position key -> (deepest result, seconds spent) of pondering
+        self.pondered = {}
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def close(self):
+        self.stop()
+        if hasattr(self.searcher, "close"):
+            self.searcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Same as best_move()
+    def best_move(self, position, depth=None, movetime_ms=None):
+        self.stop()
+        pondered = self.pondered.get(position.key())
+        self.pondered = {}
+        deadline = None
+        if movetime_ms is not None:
+            deadline = time.monotonic() + movetime_ms / 1000.0
+        result = _lookup(position, self.book, self.solve_empty, self.solver,
+                         deadline)
+        if movetime_ms is not None:
+            movetime_ms = _remaining_ms(deadline)
+        if result is None and pondered is not None:
+            result, spent = pondered
+            if movetime_ms is None:
+                if result.depth < (DEPTH if depth is None else depth):
+                    result = None
+            elif spent * 1000 < movetime_ms and abs(result.value) < WIN_SCORE:
+                # Carry on for the rest of the time, in the same generation
+                more = _best_move(self.searcher, position, depth,
+                                  movetime_ms - spent * 1000, [result.move])
+                if more.depth >= result.depth:
+                    result = more
+            if result is None:
+                result = _best_move(self.searcher, position, depth, None,
+                                    self.expected(position))
+        elif result is None:
+            pv = self.expected(position)
+            self.searcher.new_search()
+            result = _best_move(self.searcher, position, depth, movetime_ms, pv)
+        self.root = position.copy()
+        self.pv = []
+        if result.move is not None:
+            self.pv = self.searcher.principal_variation(position, result.depth,
+                                                        result.move)
+        return result
+
+    # Rest of the last principal variation when `position` is the one it
+    # expected two plies after the last search, otherwise []
+    def expected(self, position):
+        if self.root is None or len(self.pv) < 3 or \
+                position.moves != self.root.moves + 2:
+            return []
+        line = self.root.copy()
+        for col in self.pv[:2]:
+            if not line.can_play(col):
+                return []
+            line.play(col)
+        if line.key() != position.key():
+            return []
+        return self.pv[2:]
+
+    # Forgets the last search, for a new game; the table is kept
+    def new_game(self):
+        self.stop()
+        self.pondered = {}
+        self.root = None
+        self.pv = []
+
+    # Starts pondering `position`, where the opponent is to move: the reply
+    # the last principal variation expects with replies="expected", then
+    # nothing else, or every reply in turn, expected first, with "all".
+    # Each position is searched until `depth` (None for no limit), until the
+    # game is decided, or until the next best_move() or stop().
+    def ponder(self, position, replies="expected", depth=None):
+        if replies not in ("expected", "all"):
+            raise ValueError("replies must be expected or all")
+        self.stop()
+        self.pondered = {}
+        cols = [col for col in position.MOVE_ORDER
+                if position.can_play(col) and not position.is_winning_move(col)]
+        expected = None
+        if len(self.pv) >= 2 and self.root is not None and \
+                position.moves == self.root.moves + 1:
+            expected = self.pv[1]
+        if expected in cols:
+            cols = [expected] + [col for col in cols if col != expected]
+        elif replies == "expected":
+            cols = []
+        if replies == "expected":
+            cols = cols[:1]
+        lines = []
+        for col in cols:
+            line = position.copy()
+            line.play(col)
+            if not line.is_full() and \
+                    _lookup(line, self.book, self.solve_empty,
+                            self.solver) is None:
+                lines.append(line)
+        if not lines:
+            return
+        self.searcher.new_search()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._ponder, args=(lines, depth),
+                                       daemon=True)
+        self.thread.start()
+
+    # Stops pondering, within PONDER_SLICE_MS
+    def stop(self):
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    def _ponder(self, lines, depth):
+        while lines and not self.stopping.is_set():
+            for line in list(lines):
+                if self.stopping.is_set():
+                    return
+                key = line.key()
+                start = time.monotonic()
+                result = self.searcher.iterate(line.copy(), PONDER_SLICE_MS,
+                                               depth)
+                spent = time.monotonic() - start
+                previous = self.pondered.get(key)
+                if previous is not None:
+                    spent += previous[1]
+                    if previous[0].depth > result.depth:
+                        result = previous[0]
+                self.pondered[key] = (result, spent)
+                limit = line.CELLS - line.moves if depth is None else depth
+                if result.depth >= limit or abs(result.value) >= WIN_SCORE:
+                    lines.remove(line)
+
+# Loads the compiled kernel, from the on-disk cache when it is there, so that
+# the first timed search does not spend its budget on it
+def warm_up(backend="numba"):
+    if backend == "numba":
+        Searcher(backend="numba").search(Position(), 2)
+
+# Search state of a process of a pool searching engine moves, such as those
+# of analysis.analyze() and server.GameServer: a searcher, a Solver and the
+# Book of the `book` path, or None, kept from one task to the next
+_worker_searcher = None
+_worker_solver = None
+_worker_book = None
+
+# Initializer of such a pool
+def init_worker(backend, tt_mb, book=None):
+    global _worker_searcher, _worker_solver, _worker_book
+    _worker_searcher = make_searcher(backend, tt_mb=tt_mb)
+    _worker_solver = Solver()
+    if book is not None:
+        from .book import Book
+        _worker_book = Book(book)
+    warm_up(backend)
+
+# (searcher, solver, book) of this worker process, as made by init_worker()
+def worker_state():
+    return _worker_searcher, _worker_solver, _worker_book
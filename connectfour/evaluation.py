@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# Window tables for score(), built once per board, and two evaluators using
+# them: an incremental one for depth-first searches, and batch functions that
+# score whole arrays of positions with NumPy.
+import functools
+
+import numpy as np
+
+from .bitboard import (ROWS, COLUMNS, CONNECT, HEIGHT, EMPTY, HUMAN, AI,
+                       WINDOW_POINTS, Position, opponent, variant)
+
+# Steps between the cells of a window as (row, column), rows counted from the
+# bottom: horizontal, vertical, diagonal upwards and diagonal downwards
+STEPS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+def _windows(rows, columns, connect):
+    windows = []
+    for row_step, col_step in STEPS:
+        for row in range(rows):
+            for col in range(columns):
+                last_row = row + (connect - 1) * row_step
+                last_col = col + (connect - 1) * col_step
+                if 0 <= last_row < rows and last_col < columns:
+                    windows.append([(row + k * row_step, col + k * col_step)
+                                    for k in range(connect)])
+    return windows
+
+# Window tables of one board, made by window_tables()
+class WindowTables:
+    def __init__(self, rows, columns, connect):
+        height = rows + 1
+        windows = _windows(rows, columns, connect)
+        # Cells of every window as bitboard bit indexes, and as indexes into
+        # a create_board() array flattened row by row from the top
+        self.bits = np.array([[col * height + row for row, col in window]
+                              for window in windows], np.int64)
+        self.indexes = np.array([[(rows - 1 - row) * columns + col
+                                  for row, col in window]
+                                 for window in windows], np.int64)
+        self.count = len(windows)
+        # Windows crossing each bitboard bit
+        self.bit_windows = [[] for _ in range(columns * height)]
+        for window, bits in enumerate(self.bits.tolist()):
+            for bit in bits:
+                self.bit_windows[bit].append(window)
+        # Center weight of each bitboard bit
+        self.bit_weights = [0] * (columns * height)
+        for column, weight in variant(rows, columns, connect).CENTER_WEIGHTS:
+            for bit in range(columns * height):
+                if column >> bit & 1:
+                    self.bit_weights[bit] = weight
+        # Points of a window holding this many pieces of a player and no
+        # piece of the other one
+        self.points = [0] * (connect + 1)
+        for empty, points in enumerate(WINDOW_POINTS):
+            self.points[connect - empty] = points
+
+# Tables of the board of variant(rows, columns, connect), built on the first
+# call and kept
+def window_tables(rows=ROWS, columns=COLUMNS, connect=CONNECT):
+    return _window_tables(rows, columns, connect)
+
+@functools.lru_cache(maxsize=None)
+def _window_tables(rows, columns, connect):
+    return WindowTables(rows, columns, connect)
+
+# Tables of the standard board, used by the batch functions
+_STANDARD = window_tables(ROWS, COLUMNS, CONNECT)
+WINDOW_BITS = _STANDARD.bits
+WINDOW_INDEXES = _STANDARD.indexes
+WINDOWS = _STANDARD.count
+BIT_WINDOWS = _STANDARD.bit_windows
+BIT_WEIGHTS = _STANDARD.bit_weights
+POINTS = _STANDARD.points
+
+# Incremental version of score(). Every window of CONNECT cells keeps the
+# number of pieces each player has in it, and a running total per player is
+# corrected only for the windows crossing the cell of each move, so reading
+# the score of a position costs nothing. Positions of every variant() are
+# scored, with the window tables of their board.
+class IncrementalEvaluator:
+    def __init__(self, position):
+        tables = window_tables(*position.VARIANT)
+        self.bit_windows = tables.bit_windows
+        self.bit_weights = tables.bit_weights
+        self.points = tables.points
+        self.counts = [None, [0] * tables.count, [0] * tables.count]
+        self.totals = [0, 0, 0]
+        for player in (HUMAN, AI):
+            bits = position.stones(player)
+            for bit in range(len(self.bit_windows)):
+                if bits >> bit & 1:
+                    self._add(bit, player)
+
+    # Updates the counts after `position` played col
+    def play(self, position, col):
+        stack = position.mask & position.COLUMN_MASKS[col]
+        bit = ((stack + position.BOTTOM_MASKS[col]) >> 1).bit_length() - 1
+        self._add(bit, opponent(position.player))
+
+    # Updates the counts before `position` takes back col
+    def undo(self, position, col):
+        stack = position.mask & position.COLUMN_MASKS[col]
+        bit = ((stack + position.BOTTOM_MASKS[col]) >> 1).bit_length() - 1
+        self._remove(bit, opponent(position.player))
+
+    def score(self, player):
+        return self.totals[player]
+
+    def _add(self, bit, player):
+        other = opponent(player)
+        own_counts = self.counts[player]
+        other_counts = self.counts[other]
+        totals = self.totals
+        points = self.points
+        totals[player] += self.bit_weights[bit]
+        for window in self.bit_windows[bit]:
+            own = own_counts[window]
+            theirs = other_counts[window]
+            if theirs == 0:
+                totals[player] += points[own + 1] - points[own]
+            elif own == 0:
+                # The window is no longer free for the other player
+                totals[other] -= points[theirs]
+            own_counts[window] = own + 1
+
+    def _remove(self, bit, player):
+        other = opponent(player)
+        own_counts = self.counts[player]
+        other_counts = self.counts[other]
+        totals = self.totals
+        points = self.points
+        totals[player] -= self.bit_weights[bit]
+        for window in self.bit_windows[bit]:
+            own = own_counts[window] - 1
+            theirs = other_counts[window]
+            if theirs == 0:
+                totals[player] -= points[own + 1] - points[own]
+            elif own == 0:
+                totals[other] += points[theirs]
+            own_counts[window] = own
+
+# Batch versions of score() and is_win() over NumPy arrays
+POINTS_ARRAY = np.array(POINTS, np.int64)
+CENTER_INDEX_WEIGHTS = np.zeros(ROWS * COLUMNS, np.int64)
+for _bit, _weight in enumerate(BIT_WEIGHTS):
+    if _weight and _bit % HEIGHT < ROWS:
+        CENTER_INDEX_WEIGHTS[(ROWS - 1 - _bit % HEIGHT) * COLUMNS + _bit // HEIGHT] = _weight
+
+if hasattr(np, "bitwise_count"):
+    def popcounts(bits):
+        return np.bitwise_count(bits).astype(np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(byte).count("1") for byte in range(256)], np.int64)
+
+    def popcounts(bits):
+        octets = np.ascontiguousarray(bits, np.uint64).view(np.uint8)
+        return _BYTE_COUNTS[octets].reshape(bits.shape + (8,)).sum(axis=-1)
+
+# Scores and win flags of `player` for an (N, ROWS, COLUMNS) stack of
+# create_board() arrays
+def evaluate_boards(boards, player):
+    boards = np.asarray(boards)
+    flat = boards.reshape(len(boards), ROWS * COLUMNS)
+    cells = np.take(flat, WINDOW_INDEXES, axis=1)
+    own = np.count_nonzero(cells == player, axis=2)
+    free = np.count_nonzero(cells == EMPTY, axis=2) + own == CONNECT
+    scores = np.where(free, POINTS_ARRAY[own], 0).sum(axis=1)
+    scores += (flat == player) @ CENTER_INDEX_WEIGHTS
+    return scores, (own == CONNECT).any(axis=1)
+
+# Scores and win flags of the players owning `bits`, for arrays of bitboards
+# of pieces and of occupied cells of `board`, a variant() of at most 64 bits
+def evaluate_bitboards(bits, masks, board=Position):
+    bits = np.asarray(bits, np.uint64)
+    masks = np.asarray(masks, np.uint64)
+    connect = board.CONNECT
+    empty = np.uint64(board.BOARD_MASK) & ~masks
+    scores = np.zeros(bits.shape, np.int64)
+    for column, weight in board.CENTER_WEIGHTS:
+        scores += weight * popcounts(bits & np.uint64(column))
+    wins = np.zeros(bits.shape, bool)
+    for shift in board.DIRECTIONS:
+        pieces = [bits >> np.uint64(k * shift) for k in range(connect)]
+        spaces = [empty >> np.uint64(k * shift) for k in range(connect)]
+        full = pieces[0]
+        for k in range(1, connect):
+            full = full & pieces[k]
+        wins |= full != 0
+        scores += WINDOW_POINTS[0] * popcounts(full)
+        for i in range(connect):
+            window = spaces[i]
+            for k in range(connect):
+                if k != i:
+                    window = window & pieces[k]
+            scores += WINDOW_POINTS[1] * popcounts(window)
+        for i in range(connect):
+            for j in range(i + 1, connect):
+                window = spaces[i] & spaces[j]
+                for k in range(connect):
+                    if k != i and k != j:
+                        window = window & pieces[k]
+                scores += WINDOW_POINTS[2] * popcounts(window)
+    return scores, wins
+
+# Win flags alone, for arrays of bitboards
+def wins_bitboards(bits, board=Position):
+    bits = np.asarray(bits, np.uint64)
+    wins = np.zeros(bits.shape, bool)
+    for shift in board.DIRECTIONS:
+        full = bits
+        for k in range(1, board.CONNECT):
+            full = full & (bits >> np.uint64(k * shift))
+        wins |= full != 0
+    return wins
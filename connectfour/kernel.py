@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+# Alpha-beta search compiled with numba. Positions are passed as the int64
+# `current` and `mask` bitboards of bitboard.Position and the transposition
+# table as the arrays of tt.TranspositionTable, so nothing inside the search
+# allocates Python objects. Compiled functions are cached on disk, next to
+# this module, so only the first run on a host pays the compilation.
+#
+# Every variant() of at most 64 bits is searched: the masks, shifts and
+# sizes of its board are given to the compiled functions as one tuple, made
+# by kernel(), so that a single compilation serves all boards.
+import functools
+
+import numpy as np
+from numba import njit
+
+from .bitboard import WINDOW_POINTS, WIN_SCORE, Position, variant
+from .search import INFINITY, SearchResult, SearchTimeout
+from .tt import EMPTY_SLOT, EXACT, LOWER, UPPER, KEY_PRIME, MAX_DEPTH
+
+WIN = WIN_SCORE
+INF = INFINITY
+POINTS_FULL, POINTS_ONE, POINTS_TWO = WINDOW_POINTS
+
+# Table keys of 65 bits, on 64 bit boards, are reduced modulo KEY_PRIME as
+# tt.TranspositionTable does: 2 ** 64 + low is KEY_PRIME + 59 + low
+KEY_FOLD = np.uint64((1 << 64) - KEY_PRIME)
+KEY_WRAP = np.uint64(KEY_PRIME - ((1 << 64) - KEY_PRIME))
+
+# Indexes of the counters array filled by search_root. The search stops and
+# sets ABORTED once NODES reaches NODE_LIMIT.
+NODES = 0
+TT_HITS = 1
+TT_MISSES = 2
+TT_COLLISIONS = 3
+NODE_LIMIT = 4
+ABORTED = 5
+LEAVES = 6
+CUTOFFS = 7
+COUNTERS = 8
+
+NO_LIMIT = np.iinfo(np.int64).max
+
+# Shared root bound of a search without one, see negamax
+NO_BOUND = np.zeros(0, np.int64)
+
+@njit(cache=True)
+def popcount(bits):
+    bits = bits - ((bits >> 1) & 0x5555555555555555)
+    bits = (bits & 0x3333333333333333) + ((bits >> 2) & 0x3333333333333333)
+    bits = (bits + (bits >> 4)) & 0x0F0F0F0F0F0F0F0F
+    return (bits * 0x0101010101010101) >> 56 & 0xFF
+
+# Phases of the explicit-stack search in negamax
+ENTER = 0
+NEXT = 1
+RETURN = 2
+
+@njit(cache=True)
+def store(key, index, depth, value, alpha_start, beta, best_col,
+          keys, values, depths, flags, tt_moves, ages, generation):
+    if flags[index] != EMPTY_SLOT and keys[index] != key and \
+            ages[index] == generation and depths[index] > depth:
+        return
+    if value <= alpha_start:
+        flags[index] = UPPER
+    elif value >= beta:
+        flags[index] = LOWER
+    else:
+        flags[index] = EXACT
+    keys[index] = key
+    values[index] = value
+    depths[index] = min(depth, MAX_DEPTH)
+    tt_moves[index] = best_col
+    ages[index] = generation
+
+# Board of a variant() as the compiled functions read it: a tuple of its
+# bottom, top and column masks, win directions, center masks and weights and
+# move order as int64 arrays, then its board mask, CONNECT, HEIGHT, CELLS and
+# whether keys reach bit 63, so that table keys take 65 bits
+class Kernel:
+    def __init__(self, board):
+        if board.COLUMNS * board.HEIGHT > 64:
+            raise ValueError("the numba backend plays boards of at most 64 "
+                             "bits")
+        self.board = (
+            np.array(board.BOTTOM_MASKS, np.int64),
+            np.array(board.TOP_MASKS, np.int64),
+            np.array(board.COLUMN_MASKS, np.int64),
+            np.array(board.DIRECTIONS, np.int64),
+            np.array([column for column, _ in board.CENTER_WEIGHTS], np.int64),
+            np.array([weight for _, weight in board.CENTER_WEIGHTS], np.int64),
+            np.array(board.MOVE_ORDER, np.int64),
+            np.int64(board.BOARD_MASK), board.CONNECT, board.HEIGHT,
+            board.CELLS, board.COLUMNS * board.HEIGHT == 64)
+        # Arrays standing for no killer moves and no history: center-first
+        # order
+        self.no_killers = np.zeros((0, 2), np.int64)
+        self.no_history = np.zeros((0, board.COLUMNS * board.HEIGHT), np.int64)
+
+# Kernel of the board of a variant(), built on the first call and kept
+def kernel(board=Position):
+    return _kernel(board.VARIANT)
+
+@functools.lru_cache(maxsize=None)
+def _kernel(board_variant):
+    return Kernel(variant(*board_variant))
+
+@njit(cache=True)
+def is_win(board, bits):
+    (bottoms, tops, column_masks, directions, center_masks, center_weights,
+     order, board_mask, connect, height, cells, wide) = board
+    for shift in directions:
+        aligned = bits
+        for k in range(1, connect):
+            aligned &= bits >> (k * shift)
+        if aligned:
+            return True
+    return False
+
+@njit(cache=True)
+def score(board, bits, mask):
+    (bottoms, tops, column_masks, directions, center_masks, center_weights,
+     order, board_mask, connect, height, cells, wide) = board
+    empty = board_mask & ~mask
+    total = 0
+    for i in range(center_masks.shape[0]):
+        total += center_weights[i] * popcount(bits & center_masks[i])
+    for shift in directions:
+        full = bits
+        for k in range(1, connect):
+            full &= bits >> (k * shift)
+        total += POINTS_FULL * popcount(full)
+        for i in range(connect):
+            window = empty >> (i * shift)
+            for k in range(connect):
+                if k != i:
+                    window &= bits >> (k * shift)
+            total += POINTS_ONE * popcount(window)
+        for i in range(connect):
+            for j in range(i + 1, connect):
+                window = (empty >> (i * shift)) & (empty >> (j * shift))
+                for k in range(connect):
+                    if k != i and k != j:
+                        window &= bits >> (k * shift)
+                total += POINTS_TWO * popcount(window)
+    return total
+
+# Fills `out` with the legal moves of the position, in the order they
+# are tried, and returns their number: `first` (the stored best move),
+# then the killer moves of the ply, then the others by decreasing
+# history score of the side to move, center first on equal scores.
+# Empty killers and history arrays leave the center-first order.
+@njit(cache=True)
+def order_moves(board, occupied, first, side, ply, killers, history, out,
+                scores):
+    (bottoms, tops, column_masks, directions, center_masks, center_weights,
+     order, board_mask, connect, height, cells, wide) = board
+    columns = tops.shape[0]
+    count = 0
+    if first >= 0 and not occupied & tops[first]:
+        out[0] = first
+        count = 1
+    if killers.shape[0]:
+        for slot in range(2):
+            col = killers[ply, slot]
+            if col < 0 or col == first or occupied & tops[col]:
+                continue
+            if slot == 1 and col == killers[ply, 0]:
+                continue
+            out[count] = col
+            count += 1
+    start = count
+    for i in range(columns):
+        col = order[i]
+        if occupied & tops[col]:
+            continue
+        taken = False
+        for j in range(start):
+            if out[j] == col:
+                taken = True
+        if taken:
+            continue
+        score = 0
+        if history.shape[0]:
+            score = history[side, col * height +
+                            popcount(occupied & column_masks[col])]
+        # Insertion after the moves of equal or higher score
+        j = count
+        while j > start and scores[j - 1] < score:
+            out[j] = out[j - 1]
+            scores[j] = scores[j - 1]
+            j -= 1
+        out[j] = col
+        scores[j] = score
+        count += 1
+    return count
+
+# Value of the position for the player to move, as Searcher._negamax.
+# The recursion is unrolled onto arrays indexed by ply because numba
+# cannot reload recursive functions from its on-disk cache. Beta cutoffs
+# update `killers` (two columns per ply) and `history` (per side to move
+# and cell), which order_moves() reads. A one element `bound`, which may be
+# shared memory raised by another process, narrows the windows as
+# search.Searcher._narrow does, re-read every 256 nodes.
+@njit(cache=True)
+def negamax(board, current, mask, moves, depth, alpha, beta, color,
+            keys, values, depths, flags, tt_moves, ages, generation,
+            killers, history, counters, bound):
+    (bottoms, tops, column_masks, directions, center_masks, center_weights,
+     order, board_mask, connect, height, cells, wide) = board
+    columns = tops.shape[0]
+    size = np.uint64(keys.shape[0])
+    plies = depth + 1
+    currents = np.empty(plies, np.int64)
+    masks = np.empty(plies, np.int64)
+    alphas = np.empty(plies, np.int64)
+    betas = np.empty(plies, np.int64)
+    alpha_starts = np.empty(plies, np.int64)
+    best_values = np.empty(plies, np.int64)
+    best_cols = np.empty(plies, np.int64)
+    played = np.empty(plies, np.int64)
+    next_moves = np.empty(plies, np.int64)
+    move_counts = np.empty(plies, np.int64)
+    orders = np.empty((plies, columns), np.int64)
+    order_scores = np.empty(columns, np.int64)
+    first_moves = np.empty(plies, np.int64)
+    indexes = np.empty(plies, np.int64)
+    node_keys = np.empty(plies, np.uint64)
+    currents[0] = current
+    masks[0] = mask
+    alphas[0] = alpha
+    betas[0] = beta
+    shared = bound.shape[0] > 0
+    floor = bound[0] - 1 if shared else 0
+    ply = 0
+    phase = ENTER
+    result = 0
+    while True:
+        if phase == ENTER:
+            counters[NODES] += 1
+            if counters[NODES] >= counters[NODE_LIMIT]:
+                # Nothing is stored on the way out, the table stays valid
+                counters[ABORTED] = 1
+                return 0
+            if shared and not counters[NODES] & 255:
+                floor = bound[0] - 1
+            node = currents[ply]
+            occupied = masks[ply]
+            remaining = depth - ply
+            # The player that just moved is the only one that can have won
+            if is_win(board, node ^ occupied):
+                result = -WIN
+                phase = RETURN
+                continue
+            if moves + ply == cells:
+                result = 0
+                phase = RETURN
+                continue
+            if remaining == 0:
+                counters[LEAVES] += 1
+                if (color == 1) == (ply % 2 == 0):
+                    result = score(board, node, occupied)
+                else:
+                    result = -score(board, node ^ occupied, occupied)
+                phase = RETURN
+                continue
+            maximizing = (color == 1) == (ply % 2 == 0)
+            if shared:
+                if maximizing:
+                    alphas[ply] = max(alphas[ply], min(floor, betas[ply] - 1))
+                else:
+                    betas[ply] = min(betas[ply], max(-floor, alphas[ply] + 1))
+            position_key = node + occupied
+            key = np.uint64(position_key * 2 + (1 if maximizing else 0))
+            if wide and position_key < 0:
+                if key < KEY_WRAP:
+                    key += KEY_FOLD
+                else:
+                    key -= KEY_WRAP
+            index = np.int64(key % size)
+            node_keys[ply] = key
+            indexes[ply] = index
+            first_moves[ply] = -1
+            if flags[index] != EMPTY_SLOT:
+                if keys[index] == key:
+                    counters[TT_HITS] += 1
+                    first_moves[ply] = tt_moves[index]
+                    if depths[index] >= remaining:
+                        entry_value = np.int64(values[index])
+                        if flags[index] == EXACT:
+                            result = entry_value
+                            phase = RETURN
+                            continue
+                        if flags[index] == LOWER:
+                            alphas[ply] = max(alphas[ply], entry_value)
+                        else:
+                            betas[ply] = min(betas[ply], entry_value)
+                        if alphas[ply] >= betas[ply]:
+                            result = entry_value
+                            phase = RETURN
+                            continue
+                else:
+                    counters[TT_MISSES] += 1
+                    counters[TT_COLLISIONS] += 1
+            else:
+                counters[TT_MISSES] += 1
+            alpha_starts[ply] = alphas[ply]
+            best_values[ply] = -INF
+            best_cols[ply] = -1
+            next_moves[ply] = 0
+            move_counts[ply] = order_moves(board, occupied, first_moves[ply],
+                                           (moves + ply) & 1, ply, killers,
+                                           history, orders[ply],
+                                           order_scores)
+            phase = NEXT
+        elif phase == NEXT:
+            if next_moves[ply] < move_counts[ply]:
+                col = orders[ply, next_moves[ply]]
+                next_moves[ply] += 1
+            else:
+                store(node_keys[ply], indexes[ply], depth - ply,
+                      best_values[ply], alpha_starts[ply], betas[ply],
+                      best_cols[ply], keys, values, depths, flags,
+                      tt_moves, ages, generation)
+                result = best_values[ply]
+                phase = RETURN
+                continue
+            played[ply] = col
+            occupied = masks[ply]
+            currents[ply + 1] = currents[ply] ^ occupied
+            masks[ply + 1] = occupied | (occupied + bottoms[col])
+            alphas[ply + 1] = -betas[ply]
+            betas[ply + 1] = -alphas[ply]
+            ply += 1
+            phase = ENTER
+        else:
+            if ply == 0:
+                return result
+            ply -= 1
+            child = -result
+            phase = NEXT
+            if shared:
+                if (color == 1) == (ply % 2 == 0):
+                    narrowed = min(floor, betas[ply] - 1)
+                    alphas[ply] = max(alphas[ply], narrowed)
+                    alpha_starts[ply] = max(alpha_starts[ply], narrowed)
+                else:
+                    betas[ply] = min(betas[ply], max(-floor, alphas[ply] + 1))
+            if child > best_values[ply]:
+                best_values[ply] = child
+                best_cols[ply] = played[ply]
+                if child > alphas[ply]:
+                    alphas[ply] = child
+                    if child >= betas[ply]:
+                        counters[CUTOFFS] += 1
+                        col = played[ply]
+                        if killers.shape[0] and killers[ply, 0] != col:
+                            killers[ply, 1] = killers[ply, 0]
+                            killers[ply, 0] = col
+                        if history.shape[0]:
+                            row = popcount(masks[ply] & column_masks[col])
+                            history[(moves + ply) & 1, col * height + row] += \
+                                (depth - ply) * (depth - ply)
+                        store(node_keys[ply], indexes[ply], depth - ply,
+                              child, alpha_starts[ply], betas[ply],
+                              best_cols[ply], keys, values, depths, flags,
+                              tt_moves, ages, generation)
+                        result = child
+                        phase = RETURN
+
+# Same root loop as search.Searcher.search: `first` is tried before the
+# center-first order, and columns left of the current best are searched
+# with a window that can prove a tie, so the leftmost of equally good
+# columns is kept
+@njit(cache=True)
+def search_root(board, current, mask, moves, depth, first,
+                keys, values, depths, flags, tt_moves, ages, generation,
+                killers, history, counters):
+    (bottoms, tops, column_masks, directions, center_masks, center_weights,
+     order, board_mask, connect, height, cells, wide) = board
+    columns = tops.shape[0]
+    counters[NODES] += 1
+    best_col = -1
+    best_value = -INF
+    for i in range(-1, columns):
+        if i < 0:
+            col = first
+        else:
+            col = order[i]
+            if col == first:
+                continue
+        if col < 0 or mask & tops[col]:
+            continue
+        bound = best_value
+        if best_col >= 0 and col < best_col:
+            bound -= 1
+        value = -negamax(board, current ^ mask, mask | (mask + bottoms[col]),
+                         moves + 1, depth - 1, -INF, -bound, -1,
+                         keys, values, depths, flags, tt_moves, ages,
+                         generation, killers, history, counters, NO_BOUND)
+        if counters[ABORTED]:
+            break
+        if value > best_value or (value == best_value and col < best_col):
+            best_col = col
+            best_value = value
+    return best_col, best_value
+
+
+def _counters(node_limit):
+    counters = np.zeros(COUNTERS, np.int64)
+    counters[NODE_LIMIT] = NO_LIMIT if node_limit is None else node_limit
+    return counters
+
+# Runs search_root on the position with the arrays of the given table, and
+# adds the kernel counters to it, and the leaf and cutoff counts to those of
+# `totals` (a Searcher) when given. `heuristics` is the (killers, history)
+# pair of arrays kept between searches, as made by Searcher, or None.
+# Raises SearchTimeout when the search visits node_limit nodes before
+# finishing.
+def search(position, depth, tt, first=-1, totals=None, heuristics=None,
+           node_limit=None):
+    board = kernel(position)
+    counters = _counters(node_limit)
+    killers, history = heuristics or (board.no_killers, board.no_history)
+    col, value = search_root(
+        board.board, np.int64(position.current), np.int64(position.mask),
+        position.moves,
+        depth, first, tt.keys, tt.values, tt.depths, tt.flags, tt.moves,
+        tt.ages, tt.generation, killers, history, counters)
+    _count(tt, counters, totals)
+    return SearchResult(int(col), int(value), depth, int(counters[NODES]))
+
+# Returns (value, nodes) of negamax on the position. `bound` is the shared
+# root bound of search.Searcher, or None.
+def value(position, depth, alpha, beta, color, tt, totals=None,
+          heuristics=None, bound=None, node_limit=None):
+    board = kernel(position)
+    counters = _counters(node_limit)
+    killers, history = heuristics or (board.no_killers, board.no_history)
+    result = negamax(
+        board.board, np.int64(position.current), np.int64(position.mask),
+        position.moves,
+        depth, alpha, beta, color, tt.keys, tt.values, tt.depths, tt.flags,
+        tt.moves, tt.ages, tt.generation, killers, history, counters,
+        NO_BOUND if bound is None else np.frombuffer(bound, np.int64))
+    _count(tt, counters, totals)
+    return int(result), int(counters[NODES])
+
+def _count(tt, counters, totals):
+    if totals is not None:
+        totals.leaves += int(counters[LEAVES])
+        totals.cutoffs += int(counters[CUTOFFS])
+    tt.hits += int(counters[TT_HITS])
+    tt.misses += int(counters[TT_MISSES])
+    tt.collisions += int(counters[TT_COLLISIONS])
+    if counters[ABORTED]:
+        raise SearchTimeout(int(counters[NODES]))
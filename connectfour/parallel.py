@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Root split search over a process pool. The subtrees below the root (or
+# below its children with split_ply=2) are searched by separate processes,
+# each with its own Searcher and transposition table. The best value found
+# so far at the root lives in shared memory; every subtree is searched with
+# a window starting at that bound, which the workers re-read as they search
+# (see Searcher.bound), so they cut off moves that can no longer beat it.
+# As in Young Brothers Wait, the first root move is searched alone before
+# the others are dispatched, so they start with a real bound.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .bitboard import WIN_SCORE
+from .search import (INFINITY, SearchResult, SearchTimeout, Searcher,
+                     iterative_deepening, pick_move, terminal_result)
+from .tt import TranspositionTable
+
+_searcher = None
+_bound = None
+
+def _init_worker(bound, tt_mb, backend, evaluation, heuristics):
+    global _searcher, _bound
+    _searcher = Searcher(tt=TranspositionTable(tt_mb), backend=backend,
+                         evaluation=evaluation, heuristics=heuristics)
+    _searcher.bound = bound
+    _bound = bound
+
+# Value, from the root player's point of view, of the position reached by
+# playing `path` from the root. Values at or below the shared bound minus one
+# are only upper bounds; the extra point lets a tie with the best move be
+# proven, so the leftmost of equally good columns can be kept. The value is
+# None when the deadline passed first. A new generation also ages the
+# worker's killer moves and history.
+def _search_subtree(root, path, depth, deadline, generation):
+    if _searcher.tt.generation != generation:
+        _searcher.new_search()
+    _searcher.tt.generation = generation
+    position = root
+    for col in path:
+        position.play(col)
+    alpha = _bound.value - 1
+    _searcher.floor = alpha
+    _searcher.nodes = 0
+    _searcher.deadline = deadline
+    try:
+        if len(path) % 2:
+            value = -_searcher.value(position, depth - len(path), -INFINITY,
+                                     -alpha, -1)
+        else:
+            value = _searcher.value(position, depth - len(path), alpha,
+                                    INFINITY, 1)
+    except SearchTimeout:
+        value = None
+    return os.getpid(), value, _searcher.nodes
+
+class ParallelSearcher:
+    def __init__(self, workers=None, tt_mb=64, backend="python", split_ply=1,
+                 evaluation="bitboard", heuristics=True, seed=None):
+        if split_ply not in (1, 2):
+            raise ValueError("split_ply must be 1 or 2")
+        self.workers = workers or os.cpu_count()
+        self.split_ply = split_ply
+        self.seed = seed
+        self.bound = multiprocessing.RawValue("q", -INFINITY)
+        # Each worker gets an equal share of the memory budget
+        self.pool = ProcessPoolExecutor(
+            self.workers, initializer=_init_worker,
+            initargs=(self.bound, tt_mb / self.workers, backend, evaluation,
+                      heuristics))
+        self.nodes = 0
+        self.worker_nodes = {}
+        self.deadline = None
+        self.pv = []
+        self.generation = 0
+        self._iterating = False
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Same as Searcher.iterate, each iteration being a parallel search that
+    # starts with the previous best move as eldest brother. worker_nodes adds
+    # up all the iterations.
+    def iterate(self, position, movetime_ms=None, max_depth=None, pv=None):
+        self.worker_nodes = {}
+        self._iterating = True
+        try:
+            return iterative_deepening(self, position, movetime_ms, max_depth,
+                                       pv)
+        finally:
+            self._iterating = False
+
+    # Same as Searcher.new_search, for the tables of all workers
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    # Workers have their own tables, only the root move is known here
+    def principal_variation(self, position, depth, first):
+        return [] if first is None else [first]
+
+    def search(self, position, depth, first=None):
+        self.nodes = 1
+        if not self._iterating:
+            self.worker_nodes = {}
+        result = terminal_result(position, depth)
+        if result is not None:
+            return result
+        wins = [col for col in range(position.COLUMNS)
+                if position.can_play(col) and position.is_winning_move(col)]
+        if wins:
+            # Nothing beats it, the workers are not needed
+            return SearchResult(wins[0], WIN_SCORE, depth, self.nodes)
+        split_ply = min(self.split_ply, depth)
+        self.bound.value = -INFINITY
+        root = position.copy()
+        values = {}
+        order = position.MOVE_ORDER
+        if first is not None:
+            order = [first] + [col for col in order if col != first]
+        for col in order:
+            if position.can_play(col):
+                values[col] = None
+        # Moves still waiting for the value of some of their subtrees
+        pending = {}
+        running = {}
+        eldest = True
+        for col in values:
+            paths = self._paths(position, col, split_ply)
+            if not paths:
+                # The move fills the board
+                values[col] = 0
+                continue
+            pending[col] = len(paths)
+            values[col] = INFINITY
+            for path in paths:
+                future = self.pool.submit(_search_subtree, root, path, depth,
+                                          self.deadline, self.generation)
+                running[future] = col
+            if eldest:
+                # Young Brothers Wait: the eldest brother is finished before
+                # the others are started
+                self._collect(running, pending, values)
+                eldest = False
+        self._collect(running, pending, values)
+        best_col = None
+        best_value = -INFINITY
+        for col in position.MOVE_ORDER:
+            if col not in values:
+                continue
+            value = values[col]
+            if value > best_value or (value == best_value and col < best_col):
+                best_col = col
+                best_value = value
+        # Values equal to the best are exact, searched with the bound minus one
+        if self.seed is not None and abs(best_value) < WIN_SCORE:
+            best_col = pick_move([col for col in values
+                                  if values[col] == best_value],
+                                 self.seed, position)
+        return SearchResult(best_col, best_value, depth, self.nodes)
+
+    def _paths(self, position, col, split_ply):
+        if split_ply == 1:
+            return [(col,)]
+        position.play(col)
+        paths = []
+        if not position.is_full():
+            paths = [(col, reply) for reply in position.MOVE_ORDER
+                     if position.can_play(reply)]
+        position.undo(col)
+        return paths
+
+    # Waits for subtree results. The value of a root move is the smallest of
+    # its subtrees; once every subtree of a move is back, the shared bound is
+    # raised to it. Subtrees of a move already refuted are cancelled.
+    def _collect(self, running, pending, values):
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                col = running.pop(future)
+                if future.cancelled():
+                    continue
+                pid, value, nodes = future.result()
+                self.nodes += nodes
+                self.worker_nodes[pid] = self.worker_nodes.get(pid, 0) + nodes
+                if value is None:
+                    for other in running:
+                        other.cancel()
+                    wait(list(running))
+                    for other in running:
+                        if not other.cancelled():
+                            self.nodes += other.result()[2]
+                    running.clear()
+                    raise SearchTimeout(self.nodes)
+                if col not in pending:
+                    continue
+                values[col] = min(values[col], value)
+                pending[col] -= 1
+                if pending[col] == 0 or values[col] < self.bound.value:
+                    if values[col] > self.bound.value:
+                        self.bound.value = values[col]
+                    if pending[col]:
+                        for other, other_col in running.items():
+                            if other_col == col:
+                                other.cancel()
+                    del pending[col]
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Game record files: many games in a compact binary file, written once by
+# GameWriter and read back in place by GameFile, which maps the file and
+# reads games through np.frombuffer() views of it, without copies or
+# parsing. Each game is the key() of its start position, its moves as one
+# nibble per column (low nibble first), and its result.
+#
+# File layout, little endian:
+#
+#   header    magic, version, ROWS, COLUMNS, CONNECT, count, moves size
+#             (32 bytes)
+#   moves     packed moves of every game, each starting on a byte, padded
+#             to 8 bytes
+#   keys      count x uint64, start position of each game
+#   offsets   (count + 1) x uint64, start of each game in moves
+#   plies     count x uint8, number of moves of each game
+#   results   count x int8, 1 when the player to move at the start won, -1
+#             when they lost, 0 for a draw and UNFINISHED otherwise
+#
+# The arrays after the moves are the index, read at once, through which any
+# game is found by its id, its number in the file.
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from .bitboard import Position, variant
+
+MAGIC = b"C4GAMES\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHHQQ")
+UNFINISHED = -128
+
+# start is a Position, moves an array of columns from 0
+Game = namedtuple("Game", "start moves result")
+
+# Result of the game played from `start` with the given columns, for the
+# player to move at the start. Raises ValueError on an illegal move or a
+# move after the end of the game.
+def game_result(start, moves):
+    position = start.copy()
+    for ply, col in enumerate(moves):
+        if not 0 <= col < position.COLUMNS or not position.can_play(col):
+            raise ValueError("invalid move %r" % col)
+        if position.is_winning_move(col):
+            if ply != len(moves) - 1:
+                raise ValueError("moves after the end of the game")
+            return 1 if ply % 2 == 0 else -1
+        position.play(col)
+    return 0 if position.is_full() else UNFINISHED
+
+class GameWriter:
+    def __init__(self, path, board=Position):
+        if board.HEIGHT * board.COLUMNS > 64 or board.COLUMNS > 15:
+            raise ValueError("boards of at most 64 bits and 15 columns are "
+                             "recorded")
+        self.board = board
+        self.file = open(path, "wb")
+        self.file.write(bytes(HEADER.size))
+        self.keys = array("Q")
+        self.offsets = array("Q", [0])
+        self.plies = bytearray()
+        self.results = array("b")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Appends a game and returns its id. moves are columns from 0, played
+    # from `start` (the empty board by default); the result is worked out
+    # from them when not given.
+    def add(self, moves, result=None, start=None):
+        if start is None:
+            start = self.board()
+        moves = [int(col) for col in moves]
+        if result is None:
+            result = game_result(start, moves)
+        if len(moves) > 255:
+            raise ValueError("games have at most 255 moves")
+        padded = moves + [0] * (len(moves) % 2)
+        packed = bytes(low | high << 4
+                       for low, high in zip(padded[0::2], padded[1::2]))
+        self.file.write(packed)
+        self.keys.append(start.key())
+        self.offsets.append(self.offsets[-1] + len(packed))
+        self.plies.append(len(moves))
+        self.results.append(result)
+        return len(self.keys) - 1
+
+    # Writes the index and the header
+    def close(self):
+        if self.file.closed:
+            return
+        size = self.offsets[-1]
+        self.file.write(bytes(-size % 8))
+        for values, dtype in ((self.keys, "<u8"), (self.offsets, "<u8"),
+                              (self.plies, np.uint8), (self.results, np.int8)):
+            self.file.write(np.frombuffer(values, dtype).tobytes()
+                            if len(values) else b"")
+        self.file.seek(0)
+        board = self.board
+        self.file.write(HEADER.pack(MAGIC, VERSION, board.ROWS, board.COLUMNS,
+                                    board.CONNECT, len(self.keys), size))
+        self.file.close()
+
+# Games of a file written by GameWriter. The file is mapped for as long as
+# the GameFile lives; keys, offsets, plies and results are arrays over the
+# mapping, and packed() gives the moves of a game as a memoryview of it.
+class GameFile:
+    def __init__(self, path):
+        with open(path, "rb") as games:
+            self.map = mmap.mmap(games.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.map)
+        if len(self.buffer) < HEADER.size:
+            raise ValueError("%s is not a game file" % path)
+        magic, version, rows, columns, connect, count, size = \
+            HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a game file" % path)
+        self.path = path
+        self.board = variant(rows, columns, connect)
+        self.count = count
+        offset = HEADER.size + size + (-size % 8)
+        self.keys = np.frombuffer(self.buffer, "<u8", count, offset)
+        offset += 8 * count
+        self.offsets = np.frombuffer(self.buffer, "<u8", count + 1, offset)
+        offset += 8 * (count + 1)
+        self.plies = np.frombuffer(self.buffer, np.uint8, count, offset)
+        offset += count
+        self.results = np.frombuffer(self.buffer, np.int8, count, offset)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, game):
+        return Game(self.start(game), self.moves(game), int(self.results[game]))
+
+    def __iter__(self):
+        for game in range(self.count):
+            yield self[game]
+
+    def start(self, game):
+        return self.board.from_key(int(self.keys[game]))
+
+    # Moves of the game as packed in the file
+    def packed(self, game):
+        start = HEADER.size + int(self.offsets[game])
+        return self.buffer[start:HEADER.size + int(self.offsets[game + 1])]
+
+    # Columns played in the game, as a uint8 array
+    def moves(self, game):
+        packed = np.frombuffer(self.packed(game), np.uint8)
+        moves = np.empty(2 * len(packed), np.uint8)
+        moves[0::2] = packed & 0x0F
+        moves[1::2] = packed >> 4
+        return moves[:self.plies[game]]
+
+    # (moves, position) before each move of the game and after the last one,
+    # moves being the columns played from the start. The position is the
+    # same object, played on between items.
+    def positions(self, game):
+        position = self.start(game)
+        moves = self.moves(game).tolist()
+        yield [], position
+        for ply, col in enumerate(moves):
+            position.play(col)
+            yield moves[:ply + 1], position
@@ -0,0 +1,624 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import time
+from collections import namedtuple
+
+from .bitboard import WIN_SCORE, Position, opponent
+from .evaluation import IncrementalEvaluator
+from .tt import EXACT, LOWER, UPPER, TranspositionTable
+
+# Larger than any value a position can get
+INFINITY = 2 * WIN_SCORE
+
+# Center columns first, the same priority score() gives them
+# on the standard board
+MOVE_ORDER = Position.MOVE_ORDER
+
+# stats is the SearchStats of the move when the searcher profiles
+SearchResult = namedtuple("SearchResult", "move value depth nodes stats",
+                          defaults=(None,))
+
+# Returns (column, value) of the best move for the player to move, searching
+# every move up to `depth` plies. Values are from the point of view of that
+# player, like minimax(board, ply, True) of the array implementation.
+def minimax(position, depth):
+    return _minimax(position, depth, position.player)
+
+def _minimax(position, depth, root):
+    # Only the player that just moved can have won
+    last = opponent(position.player)
+    if position.has_won(last):
+        return None, WIN_SCORE if last == root else -WIN_SCORE
+    if position.is_full():
+        return None, 0
+    if depth == 0:
+        return None, position.score(root)
+    maximize = position.player == root
+    best_col = None
+    best_value = None
+    for col in range(position.COLUMNS):
+        if not position.can_play(col):
+            continue
+        position.play(col)
+        value = _minimax(position, depth - 1, root)[1]
+        position.undo(col)
+        if best_value is None or (value > best_value if maximize
+                                  else value < best_value):
+            best_col = col
+            best_value = value
+    return best_col, best_value
+
+# One of `moves`, drawn from `seed` and the position alone: the same seed
+# picks the same move in the same position, in any thread or process, and
+# no random state is shared between searches
+def pick_move(moves, seed, position):
+    return random.Random("%d:%d" % (seed, position.key())).choice(sorted(moves))
+
+# Same result as minimax() with alpha-beta pruning and center-first ordering
+def alphabeta(position, depth, tt=None, backend="python"):
+    return Searcher(tt=tt, backend=backend).search(position, depth)
+
+# Result of a search that has nothing to expand: the game is over or no ply
+# is left to search. Returns None otherwise.
+def terminal_result(position, depth):
+    if position.has_won(opponent(position.player)):
+        return SearchResult(None, -WIN_SCORE, depth, 1)
+    if position.is_full():
+        return SearchResult(None, 0, depth, 1)
+    if depth == 0:
+        return SearchResult(None, position.score(position.player), depth, 1)
+    return None
+
+# Iterative deepening: searches depth 1, 2, ... until max_depth or until
+# movetime_ms milliseconds have passed, and returns the result of the
+# deepest search that finished, whose depth is the one reached. Each
+# iteration tries the previous principal variation first, the first one
+# `pv` when given. Works with any searcher that has search(position, depth,
+# first), a `deadline`, a `pv` and principal_variation().
+def iterative_deepening(searcher, position, movetime_ms=None, max_depth=None,
+                        pv=None):
+    start = time.monotonic()
+    empty = position.CELLS - position.moves
+    if max_depth is None or max_depth > empty:
+        max_depth = empty
+    searcher.pv = list(pv) if pv else []
+    result = searcher.search(position, 0)
+    nodes = result.nodes
+    work = position.copy()
+    try:
+        for depth in range(1, max_depth + 1):
+            # One ply is always searched so that there is a move to play
+            if depth == 2 and movetime_ms is not None:
+                searcher.deadline = start + movetime_ms / 1000.0
+            first = searcher.pv[0] if searcher.pv else None
+            try:
+                result = searcher.search(work, depth, first)
+            except SearchTimeout as timeout:
+                nodes += timeout.nodes
+                break
+            nodes += result.nodes
+            searcher.pv = searcher.principal_variation(position, depth, result.move)
+            # A forced win or loss will not change with more depth
+            if abs(result.value) >= WIN_SCORE:
+                break
+    finally:
+        searcher.deadline = None
+    return result._replace(nodes=nodes)
+
+# Counters of the search of one move, made by a Searcher with profile=True.
+# iterations holds one entry per depth searched (several with iterative
+# deepening): the counters of that search alone, its time, whether it
+# finished, and the effective branching factor, nodes ** (1 / depth). The
+# totals cover all iterations, finished or not.
+class SearchStats:
+    COUNTERS = ("nodes", "leaves", "cutoffs", "tt_hits", "tt_misses")
+
+    def __init__(self, position):
+        self.moves = position.moves
+        self.key = position.key()
+        self.move = None
+        self.value = None
+        self.depth = 0
+        self.seconds = 0.0
+        self.iterations = []
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def add(self, depth, counts, seconds, finished):
+        entry = dict(zip(self.COUNTERS, counts))
+        entry.update(depth=depth, seconds=seconds, finished=finished,
+                     ebf=counts[0] ** (1.0 / depth) if depth else None)
+        self.iterations.append(entry)
+        for name, count in zip(self.COUNTERS, counts):
+            setattr(self, name, getattr(self, name) + count)
+        self.seconds += seconds
+
+    @property
+    def ebf(self):
+        if not self.depth:
+            return None
+        return self.nodes ** (1.0 / self.depth)
+
+    def as_dict(self):
+        record = {"moves": self.moves, "key": self.key, "move": self.move,
+                  "value": self.value, "depth": self.depth,
+                  "seconds": self.seconds, "ebf": self.ebf}
+        for name in self.COUNTERS:
+            record[name] = getattr(self, name)
+        record["iterations"] = self.iterations
+        return record
+
+# Raised inside a search that runs out of time or nodes. The position given
+# to the search may be left with extra moves played on it.
+class SearchTimeout(Exception):
+    def __init__(self, nodes=0):
+        Exception.__init__(self, "search stopped after %d nodes" % nodes)
+        self.nodes = nodes
+
+# backend="numba" runs the search compiled by kernel.py, which always uses a
+# transposition table and prunes. backend="numpy" runs the breadth first
+# minimax of batch.py, without pruning or table. evaluation="incremental" scores leaves with
+# evaluation.IncrementalEvaluator instead of the bitboard score(), with the
+# Python backend only. When `deadline` (a time.monotonic() value)
+# is set, searches raise SearchTimeout once it has passed; the compiled search
+# cannot read the clock, so it gets a node budget from the measured speed.
+# Leaf evaluations and beta cutoffs are counted in `leaves` and `cutoffs`,
+# except by the numpy backend. With profile=True, or a `trace` file, every
+# move also gets a SearchStats, returned in SearchResult.stats and written
+# to the trace as a JSON line; without, searches skip that bookkeeping.
+# The Python backend searches positions of any variant(); the others those
+# of boards of at most 64 bits. With heuristics=True, below the root the
+# Python and numba backends try the table's best move first, then the two
+# killer moves of the ply (the last moves that caused a beta cutoff there),
+# then the others by history score: the sum of depth ** 2 over the cutoffs
+# caused by playing in that cell, for each side to move. Both are kept from
+# one search to the next; new_search() forgets the killers, whose plies no
+# longer match, and halves the history.
+#
+# A `bound` (a multiprocessing.RawValue("q") another process may raise while
+# the search runs) is a value, for the player the search started for, that
+# some other move is already known to reach. It is re-read every 256 nodes,
+# and windows are narrowed so that values at or below it minus one are only
+# proven as upper bounds, as parallel.ParallelSearcher needs.
+#
+# Searches are deterministic: of equally good moves, the leftmost is played.
+# With a `seed`, the move is instead drawn by pick_move() from all the root
+# moves of the best value, which null window searches of the other moves
+# prove after the search (or after the last iteration of iterate()). Won and
+# lost positions keep the leftmost move.
+class Searcher:
+    def __init__(self, pruning=True, tt=None, backend="python",
+                 evaluation="bitboard", profile=False, trace=None,
+                 heuristics=True, seed=None):
+        if backend not in ("python", "numba", "numpy"):
+            raise ValueError("unknown backend %r" % backend)
+        if evaluation not in ("bitboard", "incremental"):
+            raise ValueError("unknown evaluation %r" % evaluation)
+        if backend != "python" and evaluation != "bitboard":
+            raise ValueError("the %s backend only has the bitboard evaluation"
+                             % backend)
+        if backend == "numba" and tt is None:
+            tt = TranspositionTable(0)
+        self.pruning = pruning
+        self.seed = seed
+        self.heuristics = heuristics and backend != "numpy"
+        # Created for the board of the first search
+        self.killers = None
+        self.history = None
+        self.tt = tt
+        self.backend = backend
+        self.evaluation = evaluation
+        self.evaluator = None
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.deadline = None
+        self.bound = None
+        self.floor = None
+        self.nodes_per_second = 1000000
+        self.pv = []
+        self.order = MOVE_ORDER
+        self.profile = profile or trace is not None
+        self.trace = trace
+        self.stats = None
+        self._iterating = False
+
+    def search(self, position, depth, first=None):
+        if not self.profile:
+            result = self._search(position, depth, first)
+            if self._iterating:
+                return result
+            return self._break_tie(position, result)
+        if not self._iterating:
+            self.stats = SearchStats(position)
+        start = time.monotonic()
+        tt_counts = self._tt_counts()
+        try:
+            result = self._search(position, depth, first)
+        except SearchTimeout as timeout:
+            self._add_iteration(depth, timeout.nodes, tt_counts, start, False)
+            raise
+        self._add_iteration(depth, result.nodes, tt_counts, start, True)
+        if self._iterating:
+            return result
+        return self._finish(self._break_tie(position, result))
+
+    def _search(self, position, depth, first):
+        self.nodes = 1
+        self.leaves = 0
+        self.cutoffs = 0
+        result = terminal_result(position, depth)
+        if result is not None:
+            return result
+        self._check_board(position)
+        if self.backend == "numba":
+            # Imported here so that numba is only loaded when it is used
+            from . import kernel
+            result = self._timed(kernel.search, position, depth, self.tt,
+                                 -1 if first is None else first, self,
+                                 self._heuristics(position))
+            self.nodes = result.nodes
+            return result
+        if self.backend == "numpy":
+            from . import batch
+            result = batch.search(position, depth, self.deadline)
+            self.nodes = result.nodes
+            return result
+        self._start(position)
+        best_col = None
+        best_value = -INFINITY
+        for col in self._move_order(-1 if first is None else first):
+            if not position.can_play(col):
+                continue
+            # minimax() keeps the leftmost of equally good columns, so columns
+            # left of the current best are searched with a window that can
+            # still prove a tie
+            bound = best_value
+            if best_col is not None and col < best_col:
+                bound -= 1
+            self._play(position, col)
+            value = -self._negamax(position, depth - 1, -INFINITY, -bound, -1, 1)
+            self._undo(position, col)
+            if value > best_value or (value == best_value and col < best_col):
+                best_col = col
+                best_value = value
+        return SearchResult(best_col, best_value, depth, self.nodes)
+
+    # The null window searches of the tie break stop at the same deadline as
+    # the iterations
+    def iterate(self, position, movetime_ms=None, max_depth=None, pv=None):
+        if self.profile:
+            self.stats = SearchStats(position)
+        deadline = self.deadline
+        if movetime_ms is not None:
+            limit = time.monotonic() + movetime_ms / 1000.0
+            deadline = limit if deadline is None else min(deadline, limit)
+        self._iterating = True
+        try:
+            result = iterative_deepening(self, position, movetime_ms, max_depth,
+                                         pv)
+        finally:
+            self._iterating = False
+        self.deadline = deadline
+        try:
+            result = self._break_tie(position, result)
+        finally:
+            self.deadline = None
+        if not self.profile:
+            return result
+        return self._finish(result)
+
+    # With a seed, `result` with its move drawn from the root moves as good
+    # as it, and the nodes of the null window searches proving them added.
+    # When the deadline passes before every move is proven, the move of
+    # `result` is kept.
+    def _break_tie(self, position, result):
+        if self.seed is None or result.move is None or result.depth == 0 or \
+                abs(result.value) >= WIN_SCORE:
+            return result
+        value = result.value
+        tied = [result.move]
+        self.nodes = 0
+        try:
+            for col in position.MOVE_ORDER:
+                if col == result.move or not position.can_play(col):
+                    continue
+                position.play(col)
+                try:
+                    reply = terminal_result(position, result.depth - 1)
+                    if reply is not None:
+                        self.nodes += 1
+                        score = -reply.value
+                    else:
+                        score = -self.value(position, result.depth - 1, -value,
+                                            1 - value, -1)
+                finally:
+                    position.undo(col)
+                if score >= value:
+                    tied.append(col)
+        except SearchTimeout as timeout:
+            # The Python search counts its nodes in self.nodes as it goes, the
+            # others only once they finish
+            if self.backend != "python":
+                self.nodes += timeout.nodes
+            return result._replace(nodes=result.nodes + self.nodes)
+        self.nodes += result.nodes
+        return result._replace(move=pick_move(tied, self.seed, position),
+                               nodes=self.nodes)
+
+    # Starts a new generation of the table, whose entries then outrank those
+    # of earlier searches
+    def new_search(self):
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.killers is not None:
+            if self.backend == "numba":
+                self.killers.fill(-1)
+                self.history >>= 1
+            else:
+                for slots in self.killers:
+                    slots[:] = [-1, -1]
+                for scores in self.history:
+                    scores[:] = [score >> 1 for score in scores]
+
+    # Killer and history tables for the board of the position, made on the
+    # first search: NumPy arrays (ply x 2 and side x cell) for the compiled
+    # search, lists otherwise. None without heuristics.
+    def _heuristics(self, position):
+        if not self.heuristics:
+            return None
+        cells = position.COLUMNS * position.HEIGHT
+        if self.history is None or len(self.history[0]) != cells:
+            if self.backend == "numba":
+                import numpy as np
+                self.killers = np.full((position.CELLS + 1, 2), -1, np.int64)
+                self.history = np.zeros((2, cells), np.int64)
+            else:
+                self.killers = [[-1, -1] for _ in range(position.CELLS + 1)]
+                self.history = [[0] * cells, [0] * cells]
+        return self.killers, self.history
+
+    def _tt_counts(self):
+        if self.tt is None:
+            return 0, 0
+        return self.tt.hits, self.tt.misses
+
+    def _add_iteration(self, depth, nodes, tt_counts, start, finished):
+        hits, misses = self._tt_counts()
+        counts = (nodes, self.leaves, self.cutoffs, hits - tt_counts[0],
+                  misses - tt_counts[1])
+        self.stats.add(depth, counts, time.monotonic() - start, finished)
+
+    def _finish(self, result):
+        stats = self.stats
+        stats.move = result.move
+        stats.value = result.value
+        stats.depth = result.depth
+        if self.trace is not None:
+            self.trace.write(json.dumps(stats.as_dict()) + "\n")
+            self.trace.flush()
+        return result._replace(stats=stats)
+
+    # Moves expected from both players, read from the transposition table
+    def principal_variation(self, position, depth, first):
+        if first is None:
+            return []
+        pv = [first]
+        if self.tt is None:
+            return pv
+        line = position.copy()
+        line.play(first)
+        color = -1
+        while len(pv) < depth and not line.is_full() and \
+                not line.has_won(opponent(line.player)):
+            entry = self.tt.peek(line.key() << 1 | (color == 1))
+            if entry is None or entry[3] < 0 or not line.can_play(entry[3]):
+                break
+            pv.append(entry[3])
+            line.play(entry[3])
+            color = -color
+        return pv
+
+    # Value of the position for the player to move. `color` is 1 when that
+    # player is the one the search started for, whose score() is used at
+    # the leaves, and -1 otherwise.
+    def value(self, position, depth, alpha, beta, color):
+        self._check_board(position)
+        if self.backend == "numba":
+            from . import kernel
+            value, nodes = self._timed(kernel.value, position, depth, alpha,
+                                       beta, color, self.tt, self,
+                                       self._heuristics(position), self.bound)
+            self.nodes += nodes
+            return value
+        if self.backend == "numpy":
+            from . import batch
+            value, nodes = batch.value(position, depth, color, self.deadline)
+            self.nodes += nodes
+            return value
+        self._start(position)
+        return self._negamax(position, depth, alpha, beta, color, 0)
+
+    def _check_board(self, position):
+        if self.backend != "python" and position.COLUMNS * position.HEIGHT > 64:
+            raise ValueError("the %s backend plays boards of at most 64 bits"
+                             % self.backend)
+
+    def _start(self, position):
+        self.order = position.MOVE_ORDER
+        self._heuristics(position)
+        if self.evaluation == "incremental":
+            self.evaluator = IncrementalEvaluator(position)
+
+    def _play(self, position, col):
+        position.play(col)
+        if self.evaluator is not None:
+            self.evaluator.play(position, col)
+
+    def _undo(self, position, col):
+        if self.evaluator is not None:
+            self.evaluator.undo(position, col)
+        position.undo(col)
+
+    # Calls the compiled search with a node budget that should last until the
+    # deadline, and keeps the measured speed for the next budget. The kernel
+    # cannot read the clock, so running out of nodes only ends the search
+    # once the deadline has passed; before, the search is run again with the
+    # budget of the time left at the speed just measured, from the table the
+    # last run filled.
+    def _timed(self, search, *args):
+        if self.deadline is None:
+            return search(*args)
+        spent = 0
+        while True:
+            start = time.monotonic()
+            remaining = self.deadline - start
+            if remaining <= 0:
+                raise SearchTimeout(spent)
+            limit = int(remaining * self.nodes_per_second) + 1
+            try:
+                result = search(*args, node_limit=limit)
+            except SearchTimeout as timeout:
+                self._measure(timeout.nodes, start)
+                spent += timeout.nodes
+                continue
+            if isinstance(result, SearchResult):
+                self._measure(result.nodes, start)
+                return result._replace(nodes=result.nodes + spent)
+            self._measure(result[1], start)
+            return result[0], result[1] + spent
+
+    # Speeds measured on shorter searches are mostly call overhead
+    def _measure(self, nodes, start):
+        elapsed = time.monotonic() - start
+        if elapsed > 0.005:
+            self.nodes_per_second = max(1000, int(nodes / elapsed))
+
+    def _negamax(self, position, depth, alpha, beta, color, ply):
+        self.nodes += 1
+        if not self.nodes & 255:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise SearchTimeout(self.nodes)
+            if self.bound is not None:
+                self.floor = self.bound.value - 1
+        if position.has_won(opponent(position.player)):
+            return -WIN_SCORE
+        if position.is_full():
+            return 0
+        if depth == 0:
+            self.leaves += 1
+            if self.evaluator is not None:
+                if color == 1:
+                    return self.evaluator.score(position.player)
+                return -self.evaluator.score(opponent(position.player))
+            if color == 1:
+                return position.score(position.player)
+            return -position.score(opponent(position.player))
+        if not self.pruning:
+            alpha, beta = -INFINITY, INFINITY
+        if self.floor is not None:
+            alpha, _, beta = self._narrow(alpha, alpha, beta, color)
+        tt = self.tt
+        first = -1
+        if tt is not None:
+            # Leaf values depend on which player the search started for
+            key = position.key() << 1 | (color == 1)
+            entry = tt.probe(key)
+            if entry is not None:
+                entry_depth, entry_value, flag, first = entry
+                if entry_depth >= depth:
+                    if flag == EXACT:
+                        return entry_value
+                    if flag == LOWER:
+                        alpha = max(alpha, entry_value)
+                    else:
+                        beta = min(beta, entry_value)
+                    if alpha >= beta:
+                        return entry_value
+        if first < 0 and ply < len(self.pv):
+            # Without a stored move, the previous iteration's choice at the
+            # same ply is a good guess
+            first = self.pv[ply]
+        alpha_start = alpha
+        value = -INFINITY
+        best_col = -1
+        if self.killers is None:
+            order = self._move_order(first)
+        else:
+            order = self._ordered(position, first, ply)
+        for col in order:
+            if not position.can_play(col):
+                continue
+            self._play(position, col)
+            child = -self._negamax(position, depth - 1, -beta, -alpha, -color,
+                                   ply + 1)
+            self._undo(position, col)
+            if self.floor is not None:
+                alpha, alpha_start, beta = self._narrow(alpha, alpha_start,
+                                                        beta, color)
+            if child > value:
+                value = child
+                best_col = col
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if self.killers is not None:
+                            self._reward(position, col, depth, ply)
+                        break
+        if tt is not None:
+            if value <= alpha_start:
+                flag = UPPER
+            elif value >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            tt.store(key, depth, value, flag, best_col)
+        return value
+
+    # Window of a node once `floor`, the bound minus one, is taken into
+    # account: the player the search started for needs no more than to beat
+    # it, and the other player no more than to reach it. Windows are never
+    # emptied, so every value returned stays proven. It is narrowed before
+    # the value of each child is read, as that child may have used a higher
+    # floor than the node.
+    def _narrow(self, alpha, alpha_start, beta, color):
+        if color == 1:
+            floor = min(self.floor, beta - 1)
+            return max(alpha, floor), max(alpha_start, floor), beta
+        return alpha, alpha_start, min(beta, max(-self.floor, alpha + 1))
+
+    # `first`, the killer moves of the ply, then the other legal moves by
+    # decreasing history score, center first on equal scores
+    def _ordered(self, position, first, ply):
+        killers = self.killers[ply]
+        history = self.history[position.moves & 1]
+        mask = position.mask
+        bottoms = position.BOTTOM_MASKS
+        order = [first] if first >= 0 else []
+        for col in killers:
+            if col >= 0 and col not in order:
+                order.append(col)
+        scored = []
+        for col in self.order:
+            if col not in order and position.can_play(col):
+                cell = ((mask + bottoms[col]) & ~mask).bit_length() - 1
+                scored.append((-history[cell], len(scored), col))
+        scored.sort()
+        return order + [col for _, _, col in scored]
+
+    def _reward(self, position, col, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        mask = position.mask
+        cell = ((mask + position.BOTTOM_MASKS[col]) & ~mask).bit_length() - 1
+        self.history[position.moves & 1][cell] += depth * depth
+
+    # Move to try first, then center-first
+    def _move_order(self, first):
+        if first < 0:
+            return self.order
+        return [first] + [col for col in self.order if col != first]
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+# Game server: many games held in memory and played over a line protocol on
+# TCP, with the engine moves searched on a bounded process pool so that the
+# event loop never waits on a search.
+#
+#   python -m connectfour.server serve --port 4444 --backend numba --workers 4
+#   python -m connectfour.server client --port 4444
+#
+# Each request is one line of words, each reply one line of JSON, with "ok"
+# false and an "error" when the request failed:
+#
+#   NEW [first]         new game, first is "human" (default) or "ai": {id}
+#   PLAY id col         play column col (1 to 7): {moves, result}
+#   MOVE id [ms]        engine move, searched for at most ms milliseconds:
+#                       {col, value, depth, moves, result}
+#   SHOW id             {moves, player, result}
+#   END id              forget the game
+#   QUIT                close the connection
+#
+# moves lists the columns played so far, as given to Position.from_moves(),
+# and result is null while the game goes on, then "human", "ai" or "draw".
+# PLAY is refused with "not your turn" when the engine is to move, and MOVE
+# with "not the engine's turn" when the human is. A MOVE whose game was
+# played on by another connection during the search fails with "game
+# changed" and its move is not played.
+# Engine moves that cannot start before max_pending others are refused with
+# "busy", and those that do not finish within the deadline with "timeout".
+# The deadline is passed to the worker, which stops searching there; until
+# it has, the move still counts as pending and the game as moving.
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import COLUMNS, HUMAN, AI, Position
+from .engine import best_move, init_worker, worker_state
+from .search import SearchTimeout
+
+PORT = 4444
+
+# (col, value, depth) of the engine move, or None when `deadline`, a
+# time.monotonic() value (the clock is shared by the processes of a
+# machine), passes first. Time spent in the queue counts: timed searches get
+# at most what is left, and fixed depth searches stop at the deadline.
+def _best_move(position, depth, movetime_ms, deadline):
+    remaining_ms = (deadline - time.monotonic()) * 1000
+    if remaining_ms <= 0:
+        return None
+    searcher, solver, book = worker_state()
+    # Entries of earlier requests, from any game, give way to this one
+    searcher.new_search()
+    if movetime_ms is None:
+        searcher.deadline = deadline
+    else:
+        movetime_ms = min(movetime_ms, remaining_ms)
+    try:
+        result = best_move(position, depth, movetime_ms, searcher=searcher,
+                           book=book, solver=solver)
+    except SearchTimeout:
+        return None
+    finally:
+        searcher.deadline = None
+    return result.move, result.value, result.depth
+
+class RequestError(Exception):
+    pass
+
+class Game:
+    __slots__ = ("position", "moves", "result", "busy", "used")
+
+    def __init__(self, first):
+        self.position = Position(player=first)
+        self.moves = ""
+        self.result = None
+        # An engine move is being searched
+        self.busy = False
+        self.used = time.monotonic()
+
+    # Plays col for `player`, who must be the one to move
+    def play(self, col, player):
+        if self.result is not None:
+            raise RequestError("game over")
+        if self.busy:
+            raise RequestError("engine is moving")
+        if self.position.player != player:
+            raise RequestError("not your turn" if player == HUMAN
+                               else "not the engine's turn")
+        if not 0 <= col < COLUMNS or not self.position.can_play(col):
+            raise RequestError("invalid move")
+        won = self.position.is_winning_move(col)
+        self.position.play(col)
+        self.moves += str(col + 1)
+        if won:
+            self.result = "human" if player == HUMAN else "ai"
+        elif self.position.is_full():
+            self.result = "draw"
+
+    def state(self):
+        return {"moves": self.moves, "result": self.result}
+
+class GameServer:
+    def __init__(self, workers=None, backend="python", tt_mb=64, depth=None,
+                 movetime_ms=500, deadline_ms=10000, max_pending=64,
+                 idle_s=3600, book=None):
+        self.pool = ProcessPoolExecutor(workers, initializer=init_worker,
+                                        initargs=(backend, tt_mb, book))
+        self.depth = depth
+        # 0 searches to the fixed depth instead
+        self.movetime_ms = movetime_ms or None
+        self.deadline_ms = deadline_ms
+        self.max_pending = max_pending
+        self.idle_s = idle_s
+        self.games = {}
+        self.pending = 0
+        self.ids = itertools.count(1)
+        self.server = None
+        self.expiry = None
+
+    async def start(self, host="127.0.0.1", port=PORT):
+        # Start the workers before any connection is open, so that forked
+        # workers do not hold client sockets open after the server closes them
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.pool, time.sleep, 0)
+        self.server = await asyncio.start_server(self.handle, host, port,
+                                                 limit=1024, backlog=4096)
+        self.expiry = asyncio.ensure_future(self.expire())
+        return self.server
+
+    async def close(self):
+        if self.expiry is not None:
+            self.expiry.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.shutdown(cancel_futures=True)
+
+    # Forgets games that have not been used for idle_s seconds
+    async def expire(self):
+        while True:
+            await asyncio.sleep(min(60, self.idle_s))
+            limit = time.monotonic() - self.idle_s
+            for key in [key for key, game in self.games.items()
+                        if game.used < limit and not game.busy]:
+                del self.games[key]
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than the stream limit
+                    reply = {"ok": False, "error": "line too long"}
+                    line = b""
+                else:
+                    if not line:
+                        break
+                    words = line.decode("ascii", "replace").split()
+                    if words and words[0].upper() == "QUIT":
+                        break
+                    reply = await self.request(words)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                # Stop reading from clients that do not read their replies
+                await writer.drain()
+                if not line:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def request(self, words):
+        try:
+            if not words:
+                raise RequestError("empty request")
+            command = words[0].upper()
+            if command == "NEW":
+                reply = self.new(*words[1:])
+                reply["ok"] = True
+                return reply
+            if command not in ("PLAY", "MOVE", "SHOW", "END"):
+                raise RequestError("unknown command")
+            if len(words) < 2:
+                raise RequestError("missing game id")
+            game = self.games.get(words[1])
+            if game is None:
+                raise RequestError("unknown game")
+            game.used = time.monotonic()
+            if command == "PLAY" and len(words) == 3:
+                game.play(self.column(words[2]), HUMAN)
+                reply = game.state()
+            elif command == "MOVE" and len(words) <= 3:
+                reply = await self.move(game, *words[2:])
+            elif command == "SHOW" and len(words) == 2:
+                reply = game.state()
+                reply["player"] = "human" if game.position.player == HUMAN else "ai"
+            elif command == "END" and len(words) == 2:
+                del self.games[words[1]]
+                reply = {}
+            else:
+                raise RequestError("bad request")
+        except RequestError as error:
+            return {"ok": False, "error": str(error)}
+        reply["ok"] = True
+        return reply
+
+    def new(self, first="human"):
+        if first.lower() not in ("human", "ai"):
+            raise RequestError("first must be human or ai")
+        key = "%x" % next(self.ids)
+        self.games[key] = Game(HUMAN if first.lower() == "human" else AI)
+        return {"id": key}
+
+    def column(self, word):
+        try:
+            return int(word) - 1
+        except ValueError:
+            raise RequestError("invalid move")
+
+    async def move(self, game, movetime_ms=None):
+        if game.result is not None:
+            raise RequestError("game over")
+        if game.busy:
+            raise RequestError("engine is moving")
+        if game.position.player != AI:
+            raise RequestError("not the engine's turn")
+        if self.pending >= self.max_pending:
+            raise RequestError("busy")
+        if movetime_ms is None:
+            movetime_ms = self.movetime_ms
+        else:
+            try:
+                movetime_ms = int(movetime_ms) or None
+            except ValueError:
+                raise RequestError("invalid time")
+        if movetime_ms is not None:
+            movetime_ms = min(movetime_ms, self.deadline_ms)
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.deadline_ms / 1000
+        search = loop.run_in_executor(self.pool, _best_move,
+                                      game.position.copy(), self.depth,
+                                      movetime_ms, deadline)
+        moves = game.moves
+        # The slot and the game stay taken until the worker is done, even
+        # when the reply has already been sent as a timeout. The callback is
+        # added before shield()'s, so it has run when the result is read.
+        game.busy = True
+        self.pending += 1
+
+        def finished(_):
+            self.pending -= 1
+            game.busy = False
+
+        search.add_done_callback(finished)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(search),
+                                            self.deadline_ms / 1000)
+        except asyncio.TimeoutError:
+            result = None
+        if result is None:
+            raise RequestError("timeout")
+        # Another connection may have played on the game once the search
+        # was done and before this coroutine resumed
+        if game.moves != moves or game.result is not None:
+            raise RequestError("game changed")
+        col, value, depth = result
+        game.play(col, AI)
+        reply = game.state()
+        reply.update(col=col + 1, value=value, depth=depth)
+        return reply
+
+# Blocking client of the line protocol, for scripts and tests
+class Client:
+    def __init__(self, host="127.0.0.1", port=PORT, timeout=None):
+        self.socket = socket.create_connection((host, port), timeout)
+        self.file = self.socket.makefile("rw", encoding="ascii", newline="\n")
+
+    def call(self, *words):
+        self.file.write(" ".join(str(word) for word in words) + "\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("connection closed by the server")
+        return json.loads(line)
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def serve(args):
+    server = GameServer(args.workers, args.backend, args.tt_mb, args.depth,
+                        args.movetime_ms, args.deadline_ms, args.max_pending,
+                        args.idle_s, args.book)
+    await server.start(args.host, args.port)
+    print("serving on %s:%d" % (args.host, args.port), file=sys.stderr)
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+# Types requests and prints the replies
+def client(args):
+    with Client(args.host, args.port) as connection:
+        for line in sys.stdin:
+            if not line.split():
+                continue
+            if line.split()[0].upper() == "QUIT":
+                break
+            print(json.dumps(connection.call(line.strip())))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m connectfour.server",
+                                     description="Connect Four game server")
+    parser.add_argument("mode", choices=("serve", "client"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int,
+                        help="processes searching engine moves "
+                             "(default: one per CPU)")
+    parser.add_argument("--backend", choices=("python", "numba", "numpy"),
+                        default="python",
+                        help="search implementation (default: %(default)s)")
+    parser.add_argument("--tt-mb", type=float, default=64,
+                        help="transposition table size of each worker in MiB "
+                             "(default: %(default)s)")
+    parser.add_argument("--depth", type=int,
+                        help="maximum plies searched per engine move")
+    parser.add_argument("--movetime-ms", type=int, default=500,
+                        help="default search time of an engine move, 0 to "
+                             "search to --depth (default: %(default)s)")
+    parser.add_argument("--deadline-ms", type=int, default=10000,
+                        help="engine moves not answered within this time, "
+                             "queueing included, fail (default: %(default)s)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="engine moves queued or searched at once before "
+                             "new ones are refused (default: %(default)s)")
+    parser.add_argument("--idle-s", type=float, default=3600,
+                        help="games unused for this long are forgotten "
+                             "(default: %(default)s)")
+    parser.add_argument("--book", help="opening book used by the workers")
+    args = parser.parse_args(argv)
+    if args.mode == "client":
+        client(args)
+        return
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
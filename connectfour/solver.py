@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Exact solver for positions with few empty cells, where score() leaves no
+# longer help: the game is played out to the end and the result is proven.
+#
+# A solved score is for the player to move: 0 for a draw, positive for a win
+# and negative for a loss, larger the sooner the game is won. A player that
+# wins with their k-th piece scores ROWS * COLUMNS / 2 + 1 - k, the same
+# convention as Pascal Pons' solver. The score is found by null-window
+# searches that bisect the range of possible scores (MTD(f) style), with
+# moves that hand the opponent an immediate win pruned and the others tried
+# by the number of winning cells they create.
+#
+# The table is kept from one solve to the next: its entries are bounds on
+# the score of a position, true whatever the root, so a Solver kept for a
+# game answers the later moves from what the earlier ones proved. When
+# `deadline` (a time.monotonic() value) is set, solve() and score() raise
+# SearchTimeout once it has passed, leaving the table valid.
+import time
+
+from .bitboard import (CELLS, HEIGHT, BOTTOM, BOARD_MASK, COLUMNS, COLUMN_MASKS,
+                       WIN_SCORE, popcount)
+from .search import MOVE_ORDER, SearchResult, SearchTimeout, terminal_result
+from .tt import TranspositionTable, LOWER, UPPER
+
+# Empty cells that would complete a line for the owner of `bits`
+def winning_cells(bits, mask):
+    # Vertical: only three pieces below
+    cells = (bits << 1) & (bits << 2) & (bits << 3)
+    for shift in (HEIGHT, HEIGHT + 1, HEIGHT - 1):
+        pair = (bits << shift) & (bits << 2 * shift)
+        cells |= pair & (bits << 3 * shift)
+        cells |= pair & (bits >> shift)
+        pair = (bits >> shift) & (bits >> 2 * shift)
+        cells |= pair & (bits << shift)
+        cells |= pair & (bits >> 3 * shift)
+    return cells & (BOARD_MASK ^ mask)
+
+# Playable cells of the player to move that do not let the opponent win on
+# the next move; 0 when every move loses
+def non_losing_moves(current, mask):
+    possible = (mask + BOTTOM) & BOARD_MASK
+    threats = winning_cells(current ^ mask, mask)
+    forced = possible & threats
+    if forced:
+        if forced & (forced - 1):
+            # Two threats cannot both be blocked
+            return 0
+        possible = forced
+    # Never play just below an opponent winning cell
+    return possible & ~(threats >> 1)
+
+# Solved value in the units of the heuristic search: beyond +-WIN_SCORE, so
+# that a proven result always outranks a heuristic one
+def search_value(score):
+    if score > 0:
+        return WIN_SCORE + score
+    if score < 0:
+        return -WIN_SCORE + score
+    return 0
+
+class Solver:
+    def __init__(self, tt_mb=16):
+        self.tt = TranspositionTable(tt_mb)
+        self.nodes = 0
+        self.deadline = None
+
+    # Score of a position in which the game is not over yet
+    def score(self, position):
+        current, mask, moves = position.current, position.mask, position.moves
+        possible = (mask + BOTTOM) & BOARD_MASK
+        if winning_cells(current, mask) & possible:
+            return (CELLS + 1 - moves) // 2
+        low = -((CELLS - moves) // 2)
+        high = (CELLS + 1 - moves) // 2
+        while low < high:
+            # Test values close to 0 first, which converge quicker
+            middle = low + (high - low) // 2
+            if middle <= 0 and low // 2 < middle:
+                middle = low // 2
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            value = self._negamax(current, mask, moves, middle, middle + 1)
+            if value <= middle:
+                high = value
+            else:
+                low = value
+        return low
+
+    # SearchResult of the best move: the leftmost one of best score, valued
+    # with search_value(). depth is the number of empty cells.
+    def solve(self, position):
+        self.nodes = 0
+        empty = CELLS - position.moves
+        result = terminal_result(position, empty)
+        if result is not None:
+            return result
+        current, mask, moves = position.current, position.mask, position.moves
+        score = self.score(position)
+        possible = (mask + BOTTOM) & BOARD_MASK
+        wins = winning_cells(current, mask) & possible
+        safe = non_losing_moves(current, mask)
+        best = None
+        for col in range(COLUMNS):
+            move = possible & COLUMN_MASKS[col]
+            if not move:
+                continue
+            if wins:
+                if move & wins:
+                    best = col
+                    break
+                continue
+            if not safe:
+                # Every move loses on the next one
+                best = col
+                break
+            if not move & safe:
+                continue
+            # The child is worth -score exactly when it is not worth more
+            child = self._negamax(current ^ mask, mask | move, moves + 1,
+                                  -score, -score + 1)
+            if -child >= score:
+                best = col
+                break
+        return SearchResult(best, search_value(score), empty, self.nodes)
+
+    # Alpha-beta over solved scores, for a position where the player to move
+    # cannot win immediately. Fails soft inside [alpha, beta].
+    def _negamax(self, current, mask, moves, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 255 and self.deadline is not None and \
+                time.monotonic() > self.deadline:
+            raise SearchTimeout(self.nodes)
+        safe = non_losing_moves(current, mask)
+        if not safe:
+            return -((CELLS - moves) // 2)
+        if moves >= CELLS - 2:
+            # Neither player can win with the last two pieces
+            return 0
+        # The opponent cannot win on their next move
+        low = -((CELLS - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        # Nor can we win on this one
+        high = (CELLS - 1 - moves) // 2
+        key = current + mask
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, value, flag, _ = entry
+            if flag == UPPER and value < high:
+                high = value
+            elif flag == LOWER and value > low:
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        return alpha
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+        # Moves creating the most winning cells first, center first on ties
+        ordered = []
+        for col in MOVE_ORDER:
+            move = safe & COLUMN_MASKS[col]
+            if move:
+                threats = popcount(winning_cells(current | move, mask | move))
+                index = len(ordered)
+                while index and ordered[index - 1][0] < threats:
+                    index -= 1
+                ordered.insert(index, (threats, move))
+        empty = CELLS - moves
+        for _, move in ordered:
+            value = -self._negamax(current ^ mask, mask | move, moves + 1,
+                                   -beta, -alpha)
+            if value >= beta:
+                self.tt.store(key, empty, value, LOWER, None)
+                return value
+            if value > alpha:
+                alpha = value
+        self.tt.store(key, empty, alpha, UPPER, None)
+        return alpha
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# Self-play tournament: every pair of engines plays a number of games, half
+# of them with each engine moving first, on a process pool with one game per
+# task. Results are written as JSON lines while games finish, and a table of
+# scores with Elo differences and 95% confidence intervals follows. Engines
+# are given as name:option=value,...
+#
+#   python -m connectfour.tournament d4:depth=4 d6:depth=6,backend=numba \
+#       t50:movetime_ms=50,backend=numba noab:depth=4,pruning=0 --games 100
+#
+# Options are depth, movetime_ms, backend, eval, pruning, heuristics, seed,
+# tt_mb and solve_empty, as for the game. Games start from openings of a few
+# moves, drawn from the seed without replacement, so that deterministic
+# engines do not replay the same games; each pair plays every opening once
+# with each engine first. When --opening-plies does not give enough distinct
+# openings for --games, openings get longer until it does. The confidence
+# intervals count the two games of an opening as one sample.
+# With --games-file, the games are also saved as a records.GameWriter file,
+# game ids being the "game" numbers of the JSON lines.
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .bitboard import Position
+from .engine import SOLVE_EMPTY, best_move, make_searcher, warm_up
+from .solver import Solver
+from .records import GameWriter
+
+OPTIONS = {"depth": int, "movetime_ms": int, "backend": str, "eval": str,
+           "pruning": int, "heuristics": int, "seed": int, "tt_mb": float,
+           "solve_empty": int}
+
+# (name, options) of an engine given as name:option=value,...
+def parse_engine(spec):
+    name, _, settings = spec.partition(":")
+    options = {}
+    for setting in filter(None, settings.split(",")):
+        option, _, value = setting.partition("=")
+        if option not in OPTIONS:
+            raise ValueError("unknown engine option %r" % option)
+        options[option] = OPTIONS[option](value)
+    return name, options
+
+# (searcher, solver) of this worker process, one per engine, kept between
+# games
+_searchers = {}
+
+def _searcher(name, options):
+    if name not in _searchers:
+        _searchers[name] = (make_searcher(
+            options.get("backend", "python"), options.get("eval"),
+            options.get("tt_mb", 64), pruning=bool(options.get("pruning", 1)),
+            heuristics=bool(options.get("heuristics", 1)),
+            seed=options.get("seed")), Solver())
+    searcher, solver = _searchers[name]
+    # Every game starts from empty tables, as in a new game
+    if searcher.tt is not None:
+        searcher.tt.clear()
+    solver.tt.clear()
+    return searcher, solver
+
+def _init_worker(backends):
+    for backend in backends:
+        warm_up(backend)
+
+# Plays one game and returns its record. `first` is the engine that moves
+# first after the opening, and score is its result: 1 for a win, 0.5 for a
+# draw and 0 for a loss.
+def play_game(game, first, second, opening, index):
+    start = time.monotonic()
+    engines = [(name, options) + _searcher(name, options)
+               for name, options in (first, second)]
+    position = Position()
+    moves = ""
+    score = 0.5
+    for col in opening:
+        position.play(col)
+        moves += str(col + 1)
+    while not position.is_full():
+        mover = (position.moves - len(opening)) % 2
+        _, options, searcher, solver = engines[mover]
+        col = best_move(position, options.get("depth"),
+                        options.get("movetime_ms"), searcher=searcher,
+                        solve_empty=options.get("solve_empty", SOLVE_EMPTY),
+                        solver=solver).move
+        won = position.is_winning_move(col)
+        position.play(col)
+        moves += str(col + 1)
+        if won:
+            score = 1.0 if mover == 0 else 0.0
+            break
+    return {"game": game, "first": first[0], "second": second[0],
+            "opening": index, "score": score, "moves": moves,
+            "seconds": round(time.monotonic() - start, 4)}
+
+# Moves of every distinct position `plies` moves from the empty board that
+# no move has won, one line of moves per position, in the order found
+def openings(plies):
+    lines = {Position().key(): []}
+    for _ in range(plies):
+        found = {}
+        for moves in lines.values():
+            position = Position()
+            for col in moves:
+                position.play(col)
+            for col in position.legal_moves():
+                if position.is_winning_move(col):
+                    continue
+                position.play(col)
+                found.setdefault(position.key(), moves + [col])
+                position.undo(col)
+        lines = found
+    return list(lines.values())
+
+# (openings, plies) for `games` games per pair: (games + 1) // 2 distinct
+# openings drawn from those of `plies` moves, or of more moves when there
+# are not enough of them
+def draw_openings(games, plies, seed):
+    needed = (games + 1) // 2
+    lines = openings(plies)
+    while len(lines) < needed:
+        plies += 1
+        lines = openings(plies)
+    return random.Random(seed).sample(lines, needed), plies
+
+# Games of a round robin: each pair plays `games` games on the same
+# openings, each opening both ways
+def schedule(engines, games, openings):
+    pairings = []
+    for first, second in itertools.combinations(engines, 2):
+        for game in range(games):
+            index = game // 2
+            if game % 2 == 0:
+                pairings.append((first, second, openings[index], index))
+            else:
+                pairings.append((second, first, openings[index], index))
+    return pairings
+
+# 97.5% quantiles of Student's t distribution for 1 to 30 degrees of
+# freedom, which the 95% intervals of few samples need instead of 1.96
+T_975 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+         2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+         2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+         2.048, 2.045, 2.042)
+
+# Same for any degrees of freedom, by the Cornish-Fisher expansion beyond
+# the table, which is within 0.001 of it there
+def t_quantile(freedom):
+    if freedom <= len(T_975):
+        return T_975[freedom - 1]
+    z = 1.959964
+    return (z + (z ** 3 + z) / (4 * freedom)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * freedom ** 2))
+
+# Elo difference matching a mean score, with its 95% confidence interval,
+# from the sample variance and Student's t. Games of the same `groups` value
+# (the opening, played both ways) are not independent: the interval comes
+# from the spread of the group means. With fewer than two samples, or
+# samples that are all the same, there is no interval: low and high are
+# None.
+def elo(scores, groups=None):
+    mean = sum(scores) / len(scores)
+    if groups is None:
+        samples = scores
+    else:
+        totals = {}
+        for group, score in zip(groups, scores):
+            totals.setdefault(group, []).append(score)
+        samples = [sum(group) / len(group) for group in totals.values()]
+    count = len(samples)
+    if count < 2:
+        return (_elo(mean), None, None)
+    variance = sum((sample - mean) ** 2 for sample in samples) / (count - 1)
+    if variance == 0:
+        return (_elo(mean), None, None)
+    margin = t_quantile(count - 1) * math.sqrt(variance / count)
+    return (_elo(mean), _elo(mean - margin), _elo(mean + margin))
+
+def _elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    # Adding 0.0 turns the -0.0 of an even score into 0.0
+    return -400 * math.log10(1 / score - 1) + 0.0
+
+# An Elo difference as printed: rounded, without "-0", n/a for None
+def format_elo(value):
+    if value is None:
+        return "n/a"
+    if math.isinf(value):
+        return "inf" if value > 0 else "-inf"
+    return "%d" % round(value)
+
+# Scores of every engine against each opponent, from its own point of view
+def summarize(records):
+    results = {}
+    openings = {}
+    for record in records:
+        first, second, score = record["first"], record["second"], record["score"]
+        results.setdefault((first, second), []).append(score)
+        results.setdefault((second, first), []).append(1 - score)
+        openings.setdefault((first, second), []).append(record["opening"])
+        openings.setdefault((second, first), []).append(record["opening"])
+    rows = []
+    for (engine, opponent), scores in sorted(results.items()):
+        rating, low, high = elo(scores, openings[engine, opponent])
+        rows.append({"engine": engine, "opponent": opponent,
+                     "games": len(scores), "wins": scores.count(1.0),
+                     "draws": scores.count(0.5), "losses": scores.count(0.0),
+                     "score": sum(scores) / len(scores),
+                     "elo": rating, "elo_low": low, "elo_high": high})
+    return rows
+
+def run(engines, games, workers=None, opening_plies=2, seed=0, output=None):
+    lines, plies = draw_openings(games, opening_plies, seed)
+    if plies != opening_plies:
+        print("%d games need openings of %d moves" % (games, plies),
+              file=sys.stderr)
+    pairings = schedule(engines, games, lines)
+    backends = {options.get("backend", "python") for _, options in engines}
+    records = []
+    start = time.monotonic()
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(backends,)) as pool:
+        futures = [pool.submit(play_game, game, first, second, opening, index)
+                   for game, (first, second, opening, index)
+                   in enumerate(pairings)]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if output is not None:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    return records, time.monotonic() - start
+
+# Saves the games of the records, in game order
+def save_games(path, records):
+    with GameWriter(path) as games:
+        for record in sorted(records, key=lambda record: record["game"]):
+            games.add(int(move) - 1 for move in record["moves"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m connectfour.tournament",
+                                     description="Play engines against each other")
+    parser.add_argument("engines", nargs="+", metavar="name:option=value,...",
+                        help="engine, with options among %s" % ", ".join(OPTIONS))
+    parser.add_argument("--games", type=int, default=10,
+                        help="games per pair of engines (default: %(default)s)")
+    parser.add_argument("--workers", type=int,
+                        help="processes playing games (default: one per CPU)")
+    parser.add_argument("--opening-plies", type=int, default=2,
+                        help="random moves starting each game (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the openings (default: %(default)s)")
+    parser.add_argument("--output", help="JSON lines file of the games, "
+                                         "standard output by default")
+    parser.add_argument("--games-file",
+                        help="also save the games in this game record file")
+    args = parser.parse_args(argv)
+    try:
+        engines = [parse_engine(spec) for spec in args.engines]
+    except ValueError as error:
+        parser.error(str(error))
+    if len(engines) < 2 or len({name for name, _ in engines}) != len(engines):
+        parser.error("give at least two engines with different names")
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        records, elapsed = run(engines, args.games, args.workers,
+                               args.opening_plies, args.seed, output)
+    finally:
+        if args.output:
+            output.close()
+    if args.games_file:
+        save_games(args.games_file, records)
+    print("%d games in %.1f s, %.2f games/s" % (
+        len(records), elapsed, len(records) / elapsed), file=sys.stderr)
+    print("%-12s %-12s %6s %5s %5s %5s %6s %18s" % (
+        "engine", "opponent", "games", "wins", "draws", "losses", "score",
+        "elo (95% ci)"), file=sys.stderr)
+    for row in summarize(records):
+        interval = "n/a"
+        if row["elo_low"] is not None:
+            interval = "[%s, %s]" % (format_elo(row["elo_low"]),
+                                     format_elo(row["elo_high"]))
+        print("%-12s %-12s %6d %5d %5d %5d %6.3f %6s %s" % (
+            row["engine"], row["opponent"], row["games"], row["wins"],
+            row["draws"], row["losses"], row["score"],
+            format_elo(row["elo"]), interval), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
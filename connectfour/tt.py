@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# Bound types of a stored value. 0 marks an empty slot, so a freshly
+# allocated table needs no initialisation.
+EMPTY_SLOT = 0
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# key (uint64) + value (int32) + depth (int8) + flag (uint8) + move (int8)
+# + age (uint8)
+ENTRY_BYTES = 16
+
+# Deepest depth an entry records. Deeper searches are stored as this depth,
+# which only makes their entries answer fewer probes.
+MAX_DEPTH = 127
+
+# Keys that do not fit the table, those of boards larger than the standard
+# one, are reduced modulo this prime, the largest below 2**64, so that two
+# positions only share a key by chance
+KEY_PRIME = (1 << 64) - 59
+
+# Fixed size transposition table stored in preallocated NumPy arrays, one
+# slot per key modulo the table size. A slot is only replaced by a search at
+# the same or a greater depth, by the same position, or by any search once
+# it is left from an older generation: new_search() starts a generation, so
+# that entries of past moves age out instead of holding on to their slots.
+class TranspositionTable:
+    def __init__(self, size_mb=64):
+        # An odd number of slots, so that the slot depends on every bit of
+        # the key and not only on the low ones
+        self.size = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES) | 1
+        self.keys = np.zeros(self.size, np.uint64)
+        self.values = np.zeros(self.size, np.int32)
+        self.depths = np.zeros(self.size, np.int8)
+        self.flags = np.zeros(self.size, np.uint8)
+        self.moves = np.zeros(self.size, np.int8)
+        self.ages = np.zeros(self.size, np.uint8)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    # Returns (depth, value, flag, move) stored for the key, or None
+    def probe(self, key):
+        if key >> 64:
+            key %= KEY_PRIME
+        index = key % self.size
+        flag = self.flags[index]
+        if flag != EMPTY_SLOT and self.keys[index] == key:
+            self.hits += 1
+            return (int(self.depths[index]), int(self.values[index]),
+                    int(flag), int(self.moves[index]))
+        self.misses += 1
+        if flag != EMPTY_SLOT:
+            self.collisions += 1
+        return None
+
+    # Same as probe() without touching the counters
+    def peek(self, key):
+        if key >> 64:
+            key %= KEY_PRIME
+        index = key % self.size
+        if self.flags[index] != EMPTY_SLOT and self.keys[index] == key:
+            return (int(self.depths[index]), int(self.values[index]),
+                    int(self.flags[index]), int(self.moves[index]))
+        return None
+
+    def store(self, key, depth, value, flag, move):
+        if key >> 64:
+            key %= KEY_PRIME
+        index = key % self.size
+        if self.flags[index] != EMPTY_SLOT and self.keys[index] != key and \
+                self.ages[index] == self.generation and self.depths[index] > depth:
+            return
+        self.keys[index] = key
+        self.values[index] = value
+        self.depths[index] = min(depth, MAX_DEPTH)
+        self.flags[index] = flag
+        self.moves[index] = -1 if move is None else move
+        self.ages[index] = self.generation
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        self.flags.fill(EMPTY_SLOT)
+        self.hits = self.misses = self.collisions = 0
+
+    def used(self):
+        return int(np.count_nonzero(self.flags))
+
+    def stats(self):
+        return {"size": self.size, "used": self.used(), "hits": self.hits,
+                "misses": self.misses, "collisions": self.collisions}
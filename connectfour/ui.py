@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from .bitboard import HUMAN, AI
+
+def draw_game(board, turn, game_over=False, AI_move=0, running_time=0):
+    highlight_index = AI_move - 1
+    print( "\033c") # Clear screen
+    print("  ____                            _     _____                ")
+    print(" / ___|___  _ __  _ __   ___  ___| |_  |  ___|__  _   _ _ __ ")
+    print("| |   / _ \| '_ \| '_ \ / _ \/ __| __| | |_ / _ \| | | | '__|")
+    print("| |__| (_) | | | | | | |  __/ (__| |_  |  _| (_) | |_| | |   ")
+    print(" \____\___/|_| |_|_| |_|\___|\___|\__| |_|  \___/ \__,_|_|\n")
+    # The frame is two columns wider than the board, centered under the title
+    inner = 2 * len(board[0]) + 3
+    margin = " " * ((61 - inner - 2) // 2)
+    if turn == HUMAN and not game_over:
+        message = "Your turn!"
+    elif turn == AI and not game_over:
+        message = "Computer's turn"
+    elif turn == HUMAN and game_over:
+        message = "You win!!"
+    elif turn == AI and game_over:
+        message = "Computer wins"
+    left = (inner - len(message)) // 2
+    right = inner - left - len(message)
+    print(margin + "╔" + "═" * inner + "╗")
+    print(margin + "║" + " " * left + message + " " * right + "║")
+    print(margin + "║" + " " * inner + "║")
+    for row in board:
+        line = "\033[4;30;47m|\033[0m"
+        for col, piece in enumerate(row):
+            if piece == HUMAN:
+                if col == highlight_index:
+                    highlight_index = -1
+                line += "\033[4;34;47m●\033[0m"
+            elif piece == AI:
+                if col == highlight_index:
+                    line = line[:-19] + "\033[4;31;43m|●|\033[0m"
+                    highlight_index = -1
+                    continue
+                else:
+                    line += "\033[4;31;47m●\033[0m"
+            else:
+                line += "\033[4;30;47m \033[0m"
+            line += "\033[4;30;47m|\033[0m"
+        print(margin + "║ " + line + " ║")
+    numbers = " ".join(str(col + 1) for col in range(len(board[0])))
+    print(margin + "║  " + numbers + "  ║")
+    print(margin + "╚" + "═" * inner + "╝\n")
+    if not game_over:
+        print("              Type column to play or 'q' to quit")
+        if turn == HUMAN:
+            print("             Minimax running time: %.4f seconds" % running_time)
+            print("Your move: ")
+        else:
+            print("\nWaiting for computer...")
@@ -3,6 +3,9 @@ import os, time
 import numpy as np
 import random
 import math
+from connectfour.bitboard import Position
+from connectfour.search import pick_move
+from connectfour.ui import draw_game
 
 DEPTH = 4
 
@@ -24,7 +27,7 @@ def is_valid_column(board, column):
 # Returns list of columns that are still not full
 def valid_locations(board):
     valid_locations = []
-    for i in range(1,8):
+    for i in range(1, COLUMNS + 1):
        if is_valid_column(board, i):
            valid_locations.append(i)
     return valid_locations
@@ -135,7 +138,10 @@ def evaluate_adjacents(adjacent_pieces, player):
         score += 10
     return score
 
-def minimax(board, ply, maxi_player):
+# Of equally good columns the leftmost is kept, so the search is the same
+# every time. With a seed, the column is drawn among the equally good ones
+# at the root by pick_move(), from the seed and the board only.
+def minimax(board, ply, maxi_player, seed=None):
     valid_cols = valid_locations(board)
     is_terminal = is_terminal_board(board)
     if ply == 0 or is_terminal:
@@ -148,11 +154,19 @@ def minimax(board, ply, maxi_player):
                 return (None,0)
         else: # Ply == 0
             return (None,score(board, AI))
+    if seed is not None:
+        player = AI if maxi_player else HUMAN
+        scores = [minimax(clone_and_place_piece(board, player, c), ply - 1,
+                          not maxi_player)[1] for c in valid_cols]
+        value = max(scores) if maxi_player else min(scores)
+        if abs(value) >= 1000000000: # Won or lost, keep the leftmost
+            return valid_cols[scores.index(value)], value
+        tied = [c for c, s in zip(valid_cols, scores) if s == value]
+        return pick_move(tied, seed, Position.from_array(board, player)), value
     # If max player
     if maxi_player:
         value = -math.inf
-        # If every choice has an equal score, choose randomly
-        col = random.choice(valid_cols)
+        col = valid_cols[0]
         # Expand current node/board
         for c in valid_cols:
             next_board = clone_and_place_piece(board, AI, c)
@@ -164,7 +178,7 @@ def minimax(board, ply, maxi_player):
     #if min player
     else:
         value = math.inf
-        col = random.choice(valid_cols)
+        col = valid_cols[0]
         for c in valid_cols:
             next_board = clone_and_place_piece(board, HUMAN, c)
             new_score = minimax(next_board, ply - 1, True)[1]
@@ -173,110 +187,68 @@ def minimax(board, ply, maxi_player):
                 col = c
         return col, value
 
-def draw_game(board, turn, game_over=False, AI_move=0, running_time=0):
-    highlight_index = AI_move - 1
-    print( "\033c") # Clear screen
-    print("  ____                            _     _____                ")
-    print(" / ___|___  _ __  _ __   ___  ___| |_  |  ___|__  _   _ _ __ ")
-    print("| |   / _ \| '_ \| '_ \ / _ \/ __| __| | |_ / _ \| | | | '__|")
-    print("| |__| (_) | | | | | | |  __/ (__| |_  |  _| (_) | |_| | |   ")
-    print(" \____\___/|_| |_|_| |_|\___|\___|\__| |_|  \___/ \__,_|_|\n")
-    print("                     ╔═════════════════╗")
-    if turn == HUMAN and not game_over:
-        print("                     ║   Your turn!    ║")
-    elif turn == AI and not game_over:
-        print("                     ║ Computer's turn ║")
-    elif turn == HUMAN and game_over:
-        print("                     ║    You win!!    ║")
-    elif turn == AI and game_over:
-        print("                     ║  Computer wins  ║")
-    print("                     ║                 ║")
-    for row in board:
-        line = "\033[4;30;47m|\033[0m"
-        for col, piece in enumerate(row):
-            if piece == HUMAN:
-                if col == highlight_index:
-                    highlight_index = -1
-                line += "\033[4;34;47m●\033[0m"
-            elif piece == AI:
-                if col == highlight_index:
-                    line = line[:-19] + "\033[4;31;43m|●|\033[0m"
-                    highlight_index = -1
-                    continue
+# Game loop, only run when the file is executed as a script
+def main():
+    board = create_board()
+    turn = random.choice([HUMAN, AI])
+    is_game_won = False
+    AI_move = -1
+    running_time = 0
+    draw_game(board, turn)
+    total_moves = 0
+    minimax_times = []
+    while not is_game_won:
+        total_moves += 1
+        if turn == HUMAN:
+            # Take user input
+            pressed_key = input()
+            try:
+                pressed_key = int(pressed_key)
+            except ValueError:
+                pass      
+            # If typed 1 to 7
+            if pressed_key in range(1, COLUMNS + 1) and is_valid_column(board, pressed_key):
+                place_piece(board, HUMAN, pressed_key)
+                is_game_won = detect_win(board, turn)
+                if is_game_won:
+                    draw_game(board, turn, game_over=True,
+                            running_time=running_time)
+                    break
                 else:
-                    line += "\033[4;31;47m●\033[0m"
+                    turn = AI
+                    draw_game(board, turn, running_time=running_time)
+                    continue
+            # If player chooses to quit game
+            elif pressed_key == "q":
+                print( "\033c") # Clear screen
+                print("\nThank you for playing!")
+                exit()
+            # Invalid input
             else:
-                line += "\033[4;30;47m \033[0m"
-            line += "\033[4;30;47m|\033[0m"
-        print("                     ║ " + line + " ║")
-    print("                     ║  1 2 3 4 5 6 7  ║")
-    print("                     ╚═════════════════╝\n")
-    if not game_over:
-        print("              Type column to play or 'q' to quit")
-        if turn == HUMAN:
-            print("             Minimax running time: %.4f seconds" % running_time)
-            print("Your move: ")
-        else:
-            print("\nWaiting for computer...")
+               print("\nInvalid input, try again...")
+               time.sleep(1)
+               draw_game(board, turn, AI_move = AI_move, running_time=running_time)
 
-# Start of game loop:
-board = create_board()
-turn = random.choice([HUMAN, AI])
-is_game_won = False
-AI_move = -1
-running_time = 0
-draw_game(board, turn)
-total_moves = 0
-minimax_times = []
-while not is_game_won:
-    total_moves += 1
-    if turn == HUMAN:
-        # Take user input
-        pressed_key = input()
-        try:
-            pressed_key = int(pressed_key)
-        except ValueError:
-            pass      
-        # If typed 1 to 7
-        if pressed_key in range(1,8) and is_valid_column(board, pressed_key):
-            place_piece(board, HUMAN, pressed_key)
-            is_game_won = detect_win(board, turn)
+        elif turn == AI:
+            initial_time = time.time()
+            AI_move, minimax_value = minimax(board, DEPTH, True)
+            place_piece(board, AI, AI_move)
+            is_game_won = detect_win(board, AI)
+            running_time = time.time() - initial_time
+            minimax_times.append(running_time)
             if is_game_won:
-                draw_game(board, turn, game_over=True,
+                draw_game(board, turn, game_over=True, AI_move=AI_move,
                         running_time=running_time)
                 break
             else:
-                turn = AI
-                draw_game(board, turn, running_time=running_time)
+                turn = HUMAN
+                draw_game(board, turn, AI_move=AI_move, running_time=running_time)
                 continue
-        # If player chooses to quit game
-        elif pressed_key == "q":
-            print( "\033c") # Clear screen
-            print("\nThank you for playing!")
-            exit()
-        # Invalid input
-        else:
-           print("\nInvalid input, try again...")
-           time.sleep(1)
-           draw_game(board, turn, AI_move = AI_move, running_time=running_time)
+    if is_game_won:
+        running_time = sum(minimax_times) / len(minimax_times)
+        print("                    Thank you for playing!")
+        print("          Average minimax running time: %.4f seconds" % running_time)
+        print("                   Total number of moves: %s" % total_moves)
 
-    elif turn == AI:
-        initial_time = time.time()
-        AI_move, minimax_value = minimax(board, DEPTH, True)
-        place_piece(board, AI, AI_move)
-        is_game_won = detect_win(board, AI)
-        running_time = time.time() - initial_time
-        minimax_times.append(running_time)
-        if is_game_won:
-            draw_game(board, turn, game_over=True, AI_move=AI_move,
-                    running_time=running_time)
-            break
-        else:
-            turn = HUMAN
-            draw_game(board, turn, AI_move=AI_move, running_time=running_time)
-            continue
-if is_game_won:
-    running_time = sum(minimax_times) / len(minimax_times)
-    print("                    Thank you for playing!")
-    print("          Average minimax running time: %.4f seconds" % running_time)
-    print("                   Total number of moves: %s" % total_moves)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Seeded random positions shared by the tests
+import random
+
+from connectfour.bitboard import HUMAN, AI, Position
+
+# Positions of `board` after a random number of moves, from `fewest` to
+# `most`, played by a generator seeded with `seed`. Moves that win are
+# avoided, so the game is never over.
+def random_positions(seed, count, board=Position, fewest=0, most=None):
+    rng = random.Random(seed)
+    positions = []
+    if most is None:
+        most = board.CELLS - 1
+    while len(positions) < count:
+        position = board(player=rng.choice([HUMAN, AI]))
+        target = rng.randint(fewest, most)
+        while position.moves < target:
+            cols = [col for col in position.legal_moves()
+                    if not position.is_winning_move(col)]
+            if not cols:
+                break
+            position.play(rng.choice(cols))
+        if position.moves == target:
+            positions.append(position)
+    return positions
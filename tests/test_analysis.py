@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Batch analysis: reading positions, records in input order, and the binary
+# output read back
+import io
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from connectfour.analysis import (BOARD, analyze, read_moves, read_packed,
+                                  read_records, write_binary, write_jsonl)
+from connectfour.bitboard import Position
+from connectfour.engine import best_move
+
+from .positions import random_positions
+
+def packed(boards):
+    return io.BytesIO(np.array(boards, BOARD).tobytes())
+
+def test_read_packed():
+    positions = random_positions(14, 20)
+    log = io.StringIO()
+    # Bits of the row above the board, of an empty cell, a piece above an
+    # empty cell, the pieces of one player only, and a won game
+    won = Position.from_moves("1212121")
+    bad = [(0, 1 << Position.ROWS), (1, 0), (0, 2), (3, 3),
+           (won.current, won.mask)]
+    boards = [(position.current, position.mask) for position in positions]
+    items = list(read_packed(packed(boards[:10] + bad + boards[10:]), 4, log))
+    assert [index for index, _, _ in items] == \
+        list(range(10)) + list(range(15, 25))
+    # Packed boards do not say who started, so the player is not compared
+    for (_, moves, position), expected in zip(items, positions):
+        assert moves is None
+        assert (position.current, position.mask, position.moves) == \
+            (expected.current, expected.mask, expected.moves)
+    assert log.getvalue().splitlines() == [
+        "board 11: pieces outside the board",
+        "board 12: pieces of the player to move on empty cells",
+        "board 13: pieces above an empty cell",
+        "board 14: 2 pieces of the player to move after 2 moves",
+        "board 15: game is won"]
+    with pytest.raises(ValueError):
+        list(read_packed(io.BytesIO(b"\0" * 20)))
+
+def test_analysis_order_and_records(tmp_path):
+    lines = ["", "4", "44", "8", "4453", "1234567", "7", "17", "", "3322"]
+    log = io.StringIO()
+    items = list(read_moves(lines, log))
+    assert log.getvalue() == "line 4: invalid move '8'\n"
+    chunks = list(analyze(iter(items), depth=3, workers=2, chunk_size=2,
+                          solve_empty=0, tt_mb=1))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 2, 1]
+    records = [record for chunk in chunks for record in chunk]
+    assert [index for index, _, _, _ in records] == \
+        [index for index, _, _ in items]
+    for (index, moves, key, result), (_, _, position) in zip(records, items):
+        assert moves == lines[index] and key == position.key()
+        expected = best_move(position, 3, solve_empty=0, tt_mb=1)
+        assert result[:3] == expected[:3]
+    output = io.StringIO()
+    assert write_jsonl([records], output) == 9
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(row["index"], row["moves"], row["move"]) for row in rows] == \
+        [(index, moves, result.move) for index, moves, _, result in records]
+    path = tmp_path / "analysis.bin"
+    with open(path, "wb") as output:
+        assert write_binary(chunks, output) == 9
+    array = read_records(str(path))
+    assert array.tolist() == [
+        (index, key, result.nodes, result.value, result.depth, result.move)
+        for index, _, key, result in records]
+    with open(path, "wb") as output:
+        write_binary([], output)
+    assert len(read_records(str(path))) == 0
+    path.write_bytes(b"not records")
+    with pytest.raises(ValueError):
+        read_records(str(path))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Batch evaluation and the breadth first NumPy search
+import time
+
+import pytest
+
+from connectfour.bitboard import HUMAN, AI, Position
+from connectfour.search import SearchTimeout, alphabeta
+
+from .positions import random_positions
+
+np = pytest.importorskip("numpy")
+
+def test_batch_evaluators_equal_score():
+    from connectfour.evaluation import evaluate_bitboards, evaluate_boards
+    positions = random_positions(4, 50)
+    for player in (HUMAN, AI):
+        bits = np.array([position.stones(player) for position in positions],
+                        np.uint64)
+        masks = np.array([position.mask for position in positions], np.uint64)
+        scores, wins = evaluate_bitboards(bits, masks)
+        expected = [position.score(player) for position in positions]
+        assert scores.tolist() == expected
+        assert wins.tolist() == [position.has_won(player)
+                                 for position in positions]
+        boards = np.array([position.to_array() for position in positions])
+        scores, _ = evaluate_boards(boards, player)
+        assert scores.tolist() == expected
+
+def test_numpy_search_equals_python():
+    for position in random_positions(2, 20):
+        for depth in range(1, 5):
+            expected = alphabeta(position.copy(), depth)
+            result = alphabeta(position.copy(), depth, backend="numpy")
+            assert (result.move, result.value) == \
+                (expected.move, expected.value)
+
+def test_plies_that_cannot_finish_are_refused():
+    from connectfour import batch
+    start = time.monotonic()
+    with pytest.raises(SearchTimeout):
+        batch.search(Position(), 12, time.monotonic() + 0.05)
+    assert time.monotonic() - start < 0.5
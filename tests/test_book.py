@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Opening books read back what was searched when they were written
+import pytest
+
+from connectfour.book import Book, book_positions, generate
+from connectfour.search import Searcher, alphabeta
+
+def test_generate_and_probe(tmp_path):
+    path = str(tmp_path / "book.bin")
+    positions = list(book_positions(2))
+    # 1 + 7 + 49 positions, none of them won after two moves
+    assert len(positions) == 57
+    assert generate(path, 2, 3, Searcher()) == 57
+    book = Book(path)
+    assert (len(book), book.plies, book.depth) == (57, 2, 3)
+    for position in positions:
+        expected = alphabeta(position.copy(), 3)
+        result = book.probe(position)
+        assert (result.move, result.value, result.depth) == \
+            (expected.move, expected.value, 3)
+    # Deeper than the book
+    deeper = positions[-1].copy()
+    deeper.play(3)
+    assert book.probe(deeper) is None
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a book")
+    with pytest.raises(ValueError):
+        Book(str(path))
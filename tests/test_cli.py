@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+# Command line options of the game
+import pytest
+
+from connectfour.cli import parse_args
+
+@pytest.mark.parametrize("depth", ["0", "-2"])
+def test_depth_below_one_is_refused(depth, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["--depth", depth])
+    assert "--depth must be at least 1" in capsys.readouterr().err
+
+def test_depth():
+    assert parse_args(["--depth", "1"]).depth == 1
+    assert parse_args([]).depth is None
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Incremental evaluation against score()
+import random
+
+from connectfour.bitboard import HUMAN, AI
+from connectfour.evaluation import IncrementalEvaluator
+from connectfour.search import Searcher, minimax
+from connectfour.tt import TranspositionTable
+
+from .positions import random_positions
+
+def test_incremental_evaluator_equals_score():
+    rng = random.Random(3)
+    for position in random_positions(3, 10):
+        evaluator = IncrementalEvaluator(position)
+        played = []
+        for _ in range(12):
+            cols = position.legal_moves()
+            if not cols or (played and rng.random() < 0.3):
+                if not played:
+                    break
+                col = played.pop()
+                evaluator.undo(position, col)
+                position.undo(col)
+            else:
+                col = rng.choice(cols)
+                position.play(col)
+                evaluator.play(position, col)
+                played.append(col)
+            for player in (HUMAN, AI):
+                assert evaluator.score(player) == position.score(player)
+
+def test_incremental_search_equals_minimax():
+    searcher = Searcher(tt=TranspositionTable(1), evaluation="incremental")
+    for position in random_positions(11, 10):
+        for depth in range(1, 4):
+            result = searcher.search(position.copy(), depth)
+            assert (result.move, result.value) == minimax(position, depth)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Iterative deepening under a time budget
+import time
+
+import pytest
+
+from connectfour.bitboard import WIN_SCORE, Position
+from connectfour.search import Searcher, alphabeta
+from connectfour.tt import TranspositionTable
+
+from .positions import random_positions
+
+def test_iterate_to_max_depth_equals_search():
+    for position in random_positions(10, 10):
+        searcher = Searcher(tt=TranspositionTable(1))
+        result = searcher.iterate(position.copy(), max_depth=4)
+        expected = alphabeta(position.copy(), 4)
+        if abs(expected.value) >= WIN_SCORE:
+            # Stops at the first depth proving it
+            assert result.value == expected.value
+            continue
+        assert (result.move, result.value, result.depth) == \
+            (expected.move, expected.value, 4)
+
+@pytest.mark.parametrize("backend,movetime_ms", [("python", 100),
+                                                 ("numba", 200)])
+def test_iterate_meets_its_deadline(backend, movetime_ms):
+    if backend != "python":
+        pytest.importorskip(backend)
+        from connectfour.engine import warm_up
+        warm_up(backend)
+    searcher = Searcher(tt=TranspositionTable(4), backend=backend,
+                        profile=True)
+    position = Position.from_moves("44")
+    start = time.monotonic()
+    result = searcher.iterate(position.copy(), movetime_ms=movetime_ms)
+    elapsed = time.monotonic() - start
+    assert elapsed < movetime_ms / 1000.0 + 0.05
+    finished = [entry["depth"] for entry in searcher.stats.iterations
+                if entry["finished"]]
+    # The result is that of the deepest search that finished
+    assert result.depth == max(finished) > 1
+    expected = alphabeta(position.copy(), result.depth, TranspositionTable(4),
+                         backend)
+    assert (result.move, result.value) == (expected.move, expected.value)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+# The numba compiled search against the Python one
+import pytest
+
+from connectfour.search import alphabeta
+from connectfour.tt import TranspositionTable
+
+from .positions import random_positions
+
+def test_numba_equals_python():
+    pytest.importorskip("numba")
+    for position in random_positions(2, 30):
+        for depth in range(1, 6):
+            expected = alphabeta(position.copy(), depth)
+            result = alphabeta(position.copy(), depth, TranspositionTable(1),
+                               "numba")
+            assert (result.move, result.value) == \
+                (expected.move, expected.value)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Killer moves and the history heuristic change the order of the search,
+# not what it finds
+import pytest
+
+from connectfour.search import Searcher
+from connectfour.tt import TranspositionTable
+
+from .positions import random_positions
+
+@pytest.mark.parametrize("backend", ["python", "numba"])
+def test_heuristics_search_fewer_nodes(backend):
+    if backend != "python":
+        pytest.importorskip(backend)
+    nodes = {True: 0, False: 0}
+    for position in random_positions(15, 12, most=16):
+        results = {}
+        for heuristics in (True, False):
+            searcher = Searcher(tt=TranspositionTable(4), backend=backend,
+                                heuristics=heuristics)
+            results[heuristics] = searcher.search(position.copy(), 6)
+            nodes[heuristics] += results[heuristics].nodes
+        assert results[True][:3] == results[False][:3]
+    assert nodes[True] < nodes[False]
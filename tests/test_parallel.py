@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# The process pool search against the serial one
+import pytest
+
+from connectfour.bitboard import WIN_SCORE
+from connectfour.parallel import ParallelSearcher
+from connectfour.search import alphabeta
+
+from .positions import random_positions
+
+@pytest.mark.parametrize("split_ply", [1, 2])
+def test_parallel_equals_serial(split_ply):
+    with ParallelSearcher(workers=2, tt_mb=2, split_ply=split_ply) as searcher:
+        for position in random_positions(9, 15):
+            for depth in (1, 3, 4):
+                expected = alphabeta(position.copy(), depth)
+                result = searcher.search(position.copy(), depth)
+                assert result.value == expected.value
+                if expected.value >= WIN_SCORE and \
+                        position.is_winning_move(result.move):
+                    # An immediate win is played at once, maybe another
+                    # column than the leftmost winning one
+                    continue
+                assert result.move == expected.move
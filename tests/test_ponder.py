@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Replies searched while the opponent thinks answer the next move at once
+from connectfour.bitboard import WIN_SCORE
+from connectfour.engine import Session
+
+from .positions import random_positions
+
+def test_pondered_reply_is_answered_at_once():
+    position = random_positions(12, 1, fewest=6, most=6)[0]
+    with Session(solve_empty=0, tt_mb=4) as session:
+        reply = session.best_move(position, 4)
+        position.play(reply.move)
+        session.ponder(position, "all", 4)
+        # Every reply reaches depth 4, then pondering stops by itself
+        session.thread.join(60)
+        pondered = dict(session.pondered)
+        cols = [col for col in position.legal_moves()
+                if not position.is_winning_move(col)]
+        assert len(pondered) == len(cols)
+        # A reply that is not decided was pondered to the full depth
+        for col in cols:
+            line = position.copy()
+            line.play(col)
+            result, _ = pondered[line.key()]
+            if abs(result.value) < WIN_SCORE:
+                break
+        assert result.depth == 4
+        assert session.best_move(line, 4) is result
+        assert session.pondered == {}
+    with Session(solve_empty=0, tt_mb=4) as fresh:
+        assert fresh.best_move(line, 4)[:3] == result[:3]
+
+def test_unpondered_reply_is_searched():
+    position = random_positions(13, 1, fewest=6, most=6)[0]
+    with Session(solve_empty=0, tt_mb=4) as session:
+        reply = session.best_move(position, 4)
+        position.play(reply.move)
+        session.ponder(position, "expected", 4)
+        session.thread.join(60)
+        [key] = session.pondered
+        for col in position.legal_moves():
+            line = position.copy()
+            line.play(col)
+            if line.key() != key:
+                break
+        result = session.best_move(line, 4)
+        assert result.depth == 4 and result.nodes > 1
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Game record files read back as written
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from connectfour.bitboard import Position, variant
+from connectfour.records import (UNFINISHED, GameFile, GameWriter,
+                                 game_result)
+
+from .positions import random_positions
+
+# (start, moves, result) of random games from random starts of `board`
+def random_games(seed, count, board=Position):
+    rng = random.Random(seed)
+    games = []
+    for start in random_positions(seed, count, board=board, most=10):
+        position = start.copy()
+        moves = []
+        while rng.random() < 0.97:
+            cols = position.legal_moves()
+            if not cols:
+                break
+            col = rng.choice(cols)
+            moves.append(col)
+            if position.is_winning_move(col):
+                break
+            position.play(col)
+        games.append((start, moves, game_result(start, moves)))
+    return games
+
+@pytest.mark.parametrize("board", [Position, variant(5, 6, 4)])
+def test_records_round_trip(tmp_path, board):
+    games = random_games(6, 20, board)
+    path = str(tmp_path / "games.c4g")
+    with GameWriter(path, board) as writer:
+        for start, moves, _ in games:
+            writer.add(moves, start=start)
+    records = GameFile(path)
+    assert records.board is board and len(records) == len(games)
+    for game, (start, moves, result) in zip(records, games):
+        assert game.start.key() == start.key()
+        assert game.start.moves == start.moves
+        assert game.moves.tolist() == moves
+        assert game.result == result
+    # Positions are those of the moves played from the start
+    start, moves, _ = games[0]
+    position = start.copy()
+    for ply, (played, replayed) in enumerate(records.positions(0)):
+        assert played == moves[:ply] and replayed.key() == position.key()
+        if ply < len(moves):
+            position.play(moves[ply])
+
+def test_game_result():
+    assert game_result(Position(), [0, 1, 0, 1, 0, 1, 0]) == 1
+    assert game_result(Position(), [6, 0, 1, 0, 1, 0, 1, 0]) == -1
+    assert game_result(Position(), [3, 3]) == UNFINISHED
+    with pytest.raises(ValueError):
+        game_result(Position(), [0, 1, 0, 1, 0, 1, 0, 1])
+    with pytest.raises(ValueError):
+        game_result(Position(), [7])
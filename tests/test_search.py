@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+# Alpha-beta search against plain minimax()
+from connectfour.search import Searcher, alphabeta, minimax
+
+from .positions import random_positions
+
+def test_alphabeta_equals_minimax():
+    for position in random_positions(1, 20):
+        for depth in range(1, 4):
+            expected = minimax(position, depth)
+            result = alphabeta(position.copy(), depth)
+            assert (result.move, result.value) == expected
+            # Without pruning, every node is expanded to the same result
+            result = Searcher(pruning=False).search(position.copy(), depth)
+            assert (result.move, result.value) == expected
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Seeded searches repeat their moves and draw them from every best move
+import pytest
+
+from connectfour.bitboard import WIN_SCORE
+from connectfour.engine import best_move
+from connectfour.search import _minimax, minimax, pick_move
+
+from .positions import random_positions
+
+@pytest.mark.parametrize("backend", ["python", "numba"])
+def test_seeded_moves_repeat(backend):
+    if backend != "python":
+        pytest.importorskip(backend)
+    drawn = 0
+    for position in random_positions(7, 10, most=20):
+        expected = minimax(position, 3)
+        for seed in (1, 2):
+            moves = {best_move(position.copy(), depth=3, backend=backend,
+                               seed=seed, solve_empty=0, tt_mb=1).move
+                     for _ in range(2)}
+            assert len(moves) == 1
+            move = moves.pop()
+            if abs(expected[1]) >= WIN_SCORE:
+                # Won and lost positions keep the leftmost move
+                assert move == expected[0]
+                continue
+            # The seed draws from every move as good as the best one
+            ties = []
+            root = position.player
+            for col in position.legal_moves():
+                position.play(col)
+                if _minimax(position, 2, root)[1] == expected[1]:
+                    ties.append(col)
+                position.undo(col)
+            assert move == pick_move(ties, seed, position)
+            drawn += len(ties) > 1
+    assert drawn > 0
+
+def test_pick_move():
+    position = random_positions(16, 1)[0]
+    picks = {pick_move([0, 3, 5], seed, position) for seed in range(20)}
+    assert picks == {0, 3, 5}
+    # The order of the moves does not matter
+    assert all(pick_move([5, 0, 3], seed, position) ==
+               pick_move([0, 3, 5], seed, position) for seed in range(20))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# The line protocol of the game server, over a real connection
+import asyncio
+import threading
+
+import pytest
+
+from connectfour.server import Client, GameServer
+
+@pytest.fixture(scope="module")
+def port():
+    server = GameServer(1, "python", 1, depth=2, movetime_ms=0,
+                        deadline_ms=5000)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    listening = asyncio.run_coroutine_threadsafe(
+        server.start("127.0.0.1", 0), loop).result(30)
+    yield listening.sockets[0].getsockname()[1]
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(30)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+def test_game(port):
+    with Client(port=port, timeout=30) as client:
+        game = client.call("NEW")["id"]
+        assert client.call("SHOW", game) == {"ok": True, "moves": "",
+                                             "result": None,
+                                             "player": "human"}
+        assert client.call("MOVE", game) == {"ok": False,
+                                             "error": "not the engine's turn"}
+        assert client.call("PLAY", game, 4) == {"ok": True, "moves": "4",
+                                                "result": None}
+        assert client.call("PLAY", game, 4) == {"ok": False,
+                                                "error": "not your turn"}
+        reply = client.call("MOVE", game)
+        assert reply["ok"] and reply["depth"] == 2
+        assert reply["moves"] == "4%d" % reply["col"]
+        assert client.call("SHOW", game)["player"] == "human"
+        assert client.call("PLAY", game, 8) == {"ok": False,
+                                                "error": "invalid move"}
+        assert client.call("END", game) == {"ok": True}
+        assert client.call("SHOW", game) == {"ok": False,
+                                             "error": "unknown game"}
+
+def test_engine_first(port):
+    with Client(port=port, timeout=30) as client:
+        game = client.call("NEW", "ai")["id"]
+        assert client.call("PLAY", game, 1) == {"ok": False,
+                                                "error": "not your turn"}
+        reply = client.call("MOVE", game)
+        assert reply["ok"] and len(reply["moves"]) == 1
+        assert client.call("MOVE", game) == {"ok": False,
+                                             "error": "not the engine's turn"}
+
+def test_bad_requests(port):
+    with Client(port=port, timeout=30) as client:
+        assert client.call("SHOW", "zz") == {"ok": False,
+                                             "error": "unknown game"}
+        assert client.call("PLAY") == {"ok": False, "error": "missing game id"}
+        assert client.call("HELLO", 1) == {"ok": False,
+                                           "error": "unknown command"}
+        assert client.call("NEW", "nobody") == {
+            "ok": False, "error": "first must be human or ai"}
+        game = client.call("NEW")["id"]
+        assert client.call("PLAY", game, "x") == {"ok": False,
+                                                  "error": "invalid move"}
+        assert client.call("SHOW", game, 1) == {"ok": False,
+                                                "error": "bad request"}
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# What a Session keeps from one move to the next
+from connectfour.engine import Session
+
+from .positions import random_positions
+
+def test_session_reuses_table_and_variation():
+    checked = 0
+    for position in random_positions(11, 6, most=12):
+        with Session(solve_empty=0, tt_mb=4) as session:
+            searcher = session.searcher
+            session.best_move(position, 6)
+            pv = list(session.pv)
+            if len(pv) < 3:
+                continue
+            generation = searcher.tt.generation
+            # The game goes on as the variation expected
+            line = position.copy()
+            line.play(pv[0])
+            line.play(pv[1])
+            assert session.expected(line) == pv[2:]
+            reused = session.best_move(line, 6)
+            assert session.searcher is searcher
+            assert searcher.tt.generation == generation + 1
+            session.new_game()
+            assert session.pv == [] and session.expected(line) == []
+            assert searcher.tt.used() > 0
+        with Session(solve_empty=0, tt_mb=4) as fresh:
+            expected = fresh.best_move(line, 6)
+        # Same answer, from fewer nodes
+        assert reused[:3] == expected[:3]
+        assert reused.nodes < expected.nodes
+        checked += 1
+    assert checked == 4
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# The solver against playing every game to its end, and the Solver the
+# engine keeps from one move to the next
+import time
+
+import pytest
+
+from connectfour.bitboard import Position
+from connectfour.engine import Session, best_move
+from connectfour.search import SearchTimeout
+from connectfour.solver import Solver, search_value
+
+from .positions import random_positions
+
+# Score, as Solver.score() gives it, of a position that is not over, found by
+# playing every game to its end
+def solved_score(position):
+    if any(position.can_play(col) and position.is_winning_move(col)
+           for col in range(position.COLUMNS)):
+        return (position.CELLS + 1 - position.moves) // 2
+    if position.moves == position.CELLS - 1:
+        return 0
+    best = None
+    for col in position.legal_moves():
+        position.play(col)
+        value = -solved_score(position)
+        position.undo(col)
+        if best is None or value > best:
+            best = value
+    return best
+
+def test_solver_is_exact():
+    # One solver for every position, as a game keeps it
+    solver = Solver(1)
+    for position in random_positions(5, 30, fewest=Position.CELLS - 9):
+        score = solved_score(position)
+        assert solver.score(position) == score
+        result = solver.solve(position)
+        assert result.value == search_value(score)
+        assert Solver(1).solve(position)[:3] == result[:3]
+        # The move played keeps the score
+        if not position.is_winning_move(result.move):
+            position.play(result.move)
+            child = 0 if position.is_full() else solved_score(position)
+            position.undo(result.move)
+            assert -child == score
+
+def test_solver_deadline():
+    solver = Solver(1)
+    solver.deadline = time.monotonic() - 1
+    with pytest.raises(SearchTimeout):
+        solver.solve(Position())
+    # A solve that runs out of time gives way to the search
+    result = best_move(Position(), 2, solve_empty=Position.CELLS, solver=solver,
+                       movetime_ms=1)
+    assert result.depth < Position.CELLS
+
+def test_session_keeps_its_solver():
+    position = random_positions(24, 1, fewest=Position.CELLS - 12,
+                                most=Position.CELLS - 12)[0]
+    with Session(solve_empty=12, tt_mb=1) as session:
+        solver = session.solver
+        first = session.best_move(position)
+        assert first == Solver(1).solve(position)._replace(nodes=first.nodes)
+        # The second solve starts from what the first proved
+        again = session.best_move(position)
+        assert again[:3] == first[:3] and again.nodes < first.nodes
+        assert session.solver is solver
+    with Session(solve_empty=0, tt_mb=1) as session:
+        assert session.solver is None
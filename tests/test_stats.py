@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Search statistics and the trace they are written to
+import io
+import json
+
+from connectfour.search import Searcher
+from connectfour.tt import TranspositionTable
+
+from .positions import random_positions
+
+def test_search_stats():
+    for position in random_positions(8, 10, most=20):
+        plain = Searcher(tt=TranspositionTable(1)).search(position.copy(), 4)
+        assert plain.stats is None
+        result = Searcher(tt=TranspositionTable(1),
+                          profile=True).search(position.copy(), 4)
+        # Counting changes nothing that is found
+        assert result[:4] == plain[:4]
+        stats = result.stats
+        assert (stats.move, stats.value, stats.depth) == result[:3]
+        assert (stats.moves, stats.key) == (position.moves, position.key())
+        [iteration] = stats.iterations
+        assert iteration["finished"] and iteration["depth"] == 4
+        assert iteration["nodes"] == stats.nodes == result.nodes
+        assert stats.tt_hits + stats.tt_misses > 0
+        assert stats.ebf == stats.nodes ** 0.25
+
+def test_trace_of_iterations():
+    trace = io.StringIO()
+    searcher = Searcher(tt=TranspositionTable(1), trace=trace)
+    positions = random_positions(9, 3, most=20)
+    results = [searcher.iterate(position.copy(), max_depth=5)
+               for position in positions]
+    records = [json.loads(line) for line in trace.getvalue().splitlines()]
+    # One line per move
+    assert len(records) == 3
+    for position, result, record in zip(positions, results, records):
+        assert record == json.loads(json.dumps(result.stats.as_dict()))
+        assert (record["key"], record["move"], record["value"]) == \
+            (position.key(), result.move, result.value)
+        depths = [entry["depth"] for entry in record["iterations"]]
+        assert depths == list(range(result.depth + 1))
+        assert all(entry["finished"] for entry in record["iterations"])
+        for name in ("nodes", "leaves", "cutoffs", "tt_hits", "tt_misses"):
+            assert record[name] == sum(entry[name]
+                                       for entry in record["iterations"])
+        assert record["nodes"] == result.nodes
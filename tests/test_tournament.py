@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Elo differences and their intervals, and the summary of a tournament
+import math
+
+from connectfour.tournament import elo, format_elo, summarize, t_quantile
+
+def test_even_score_is_zero():
+    rating, low, high = elo([1.0, 0.0, 0.5, 0.5])
+    assert rating == 0 and math.copysign(1, rating) == 1
+    assert format_elo(rating) == "0" and format_elo(-0.4) == "0"
+    assert low == -high
+
+def test_interval_of_few_samples():
+    # Two openings: the group means are 1 and 0.5, mean 0.75, sample
+    # variance 0.125, with the t quantile of one degree of freedom
+    rating, low, high = elo([1.0, 1.0, 0.5, 0.5], groups=[0, 0, 1, 1])
+    margin = 12.706 * math.sqrt(0.125 / 2)
+    assert math.isclose(rating, 400 * math.log10(3))
+    # The interval is wider than the score range
+    assert 0.75 + margin > 1 and (low, high) == (-math.inf, math.inf)
+    assert format_elo(high) == "inf"
+    scores = [1.0, 0.5, 0.5, 0.5, 0.5, 0.0, 0.5, 1.0]
+    rating, low, high = elo(scores)
+    # Mean 0.5625, sample variance 0.1026, t of 7 degrees of freedom
+    mean = sum(scores) / 8
+    variance = sum((score - mean) ** 2 for score in scores) / 7
+    margin = 2.365 * math.sqrt(variance / 8)
+    assert math.isclose(low, -400 * math.log10(1 / (mean - margin) - 1))
+    assert math.isclose(high, -400 * math.log10(1 / (mean + margin) - 1))
+    assert t_quantile(1) == 12.706 and abs(t_quantile(31) - 2.040) < 0.001
+
+def test_no_interval():
+    assert elo([1.0]) == (math.inf, None, None)
+    assert elo([0.5, 0.5, 0.5]) == (0.0, None, None)
+    # Both games of a single opening are one sample
+    assert elo([1.0, 0.0], groups=[3, 3])[1:] == (None, None)
+    assert format_elo(None) == "n/a"
+
+def test_summarize():
+    records = [{"first": "a", "second": "b", "score": 1.0, "opening": 0},
+               {"first": "b", "second": "a", "score": 0.5, "opening": 0},
+               {"first": "a", "second": "b", "score": 0.0, "opening": 1},
+               {"first": "b", "second": "a", "score": 0.0, "opening": 1}]
+    rows = summarize(records)
+    assert [(row["engine"], row["opponent"]) for row in rows] == \
+        [("a", "b"), ("b", "a")]
+    a, b = rows
+    assert (a["games"], a["wins"], a["draws"], a["losses"]) == (4, 2, 1, 1)
+    assert (b["wins"], b["draws"], b["losses"]) == (1, 1, 2)
+    assert a["score"] == 0.625 and b["score"] == 0.375
+    assert math.isclose(a["elo"], -b["elo"])
+    # Opening 0 scored 0.75 for a, opening 1 0.5
+    assert elo([0.75, 0.5])[1:] == (a["elo_low"], a["elo_high"])
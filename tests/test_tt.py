@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Transposition table counters, replacement and the searches using it
+from connectfour.search import Searcher, minimax
+from connectfour.tt import EXACT, LOWER, MAX_DEPTH, TranspositionTable
+
+from .positions import random_positions
+
+def test_counters():
+    tt = TranspositionTable(0)
+    size = tt.size
+    assert tt.probe(5) is None
+    tt.store(5, 3, 10, EXACT, 2)
+    assert tt.probe(5) == (3, 10, EXACT, 2)
+    # Same slot, other key
+    assert tt.probe(5 + size) is None
+    assert tt.peek(5) == (3, 10, EXACT, 2)
+    assert (tt.hits, tt.misses, tt.collisions) == (1, 2, 1)
+    assert tt.used() == 1
+    tt.clear()
+    assert tt.probe(5) is None and tt.used() == 0
+
+def test_replacement_by_depth_and_age():
+    tt = TranspositionTable(0)
+    other = 7 + tt.size
+    tt.store(7, 5, 1, EXACT, 0)
+    # A shallower search of another position keeps the entry
+    tt.store(other, 4, 2, LOWER, 1)
+    assert tt.peek(7) == (5, 1, EXACT, 0) and tt.peek(other) is None
+    # The same position is always replaced
+    tt.store(7, 2, 3, LOWER, 4)
+    assert tt.peek(7) == (2, 3, LOWER, 4)
+    tt.store(7, 5, 1, EXACT, 0)
+    # Entries of an earlier generation give way to any search
+    tt.new_search()
+    tt.store(other, 1, 2, LOWER, 1)
+    assert tt.peek(7) is None and tt.peek(other) == (1, 2, LOWER, 1)
+
+def test_deep_entries_are_clamped():
+    tt = TranspositionTable(0)
+    tt.store(1 << 70, 200, 0, EXACT, None)
+    assert tt.peek(1 << 70) == (MAX_DEPTH, 0, EXACT, -1)
+
+def test_table_keeps_minimax_results():
+    tt = TranspositionTable(1)
+    searcher = Searcher(tt=tt)
+    for position in random_positions(8, 20):
+        for depth in range(1, 5):
+            result = searcher.search(position.copy(), depth)
+            assert (result.move, result.value) == minimax(position, depth)
+    assert tt.hits > 0
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Other board sizes and line lengths, searched and evaluated like the
+# standard board
+import random
+
+import pytest
+
+from connectfour.bitboard import HUMAN, AI, variant
+from connectfour.search import Searcher, alphabeta, minimax
+from connectfour.tt import TranspositionTable
+
+from .positions import random_positions
+
+# The last one is wider than 64 bits, for the Python backend only
+BOARDS = [variant(5, 6, 4), variant(4, 5, 3), variant(7, 9, 5)]
+SMALL = BOARDS[:2]
+
+def test_variant_classes_are_kept():
+    assert variant(5, 6, 4) is BOARDS[0]
+    with pytest.raises(ValueError):
+        variant(4, 4, 5)
+
+@pytest.mark.parametrize("board", BOARDS)
+def test_alphabeta_equals_minimax(board):
+    for position in random_positions(1, 10, board=board):
+        for depth in range(1, 4):
+            expected = minimax(position, depth)
+            for searcher in (Searcher(tt=TranspositionTable(1)),
+                             Searcher(tt=TranspositionTable(1),
+                                      evaluation="incremental")):
+                result = searcher.search(position.copy(), depth)
+                assert (result.move, result.value) == expected
+
+@pytest.mark.parametrize("board", SMALL)
+@pytest.mark.parametrize("backend", ["numba", "numpy"])
+def test_backends_agree(board, backend):
+    pytest.importorskip(backend)
+    for position in random_positions(2, 20, board=board):
+        for depth in range(1, 5):
+            expected = alphabeta(position.copy(), depth)
+            result = alphabeta(position.copy(), depth, TranspositionTable(1),
+                               backend)
+            assert (result.move, result.value) == \
+                (expected.move, expected.value)
+
+@pytest.mark.parametrize("board", BOARDS)
+def test_incremental_evaluator_equals_score(board):
+    from connectfour.evaluation import IncrementalEvaluator
+    rng = random.Random(3)
+    for position in random_positions(3, 10, board=board):
+        evaluator = IncrementalEvaluator(position)
+        played = []
+        for _ in range(12):
+            cols = position.legal_moves()
+            if not cols or (played and rng.random() < 0.3):
+                if not played:
+                    break
+                col = played.pop()
+                evaluator.undo(position, col)
+                position.undo(col)
+            else:
+                col = rng.choice(cols)
+                position.play(col)
+                evaluator.play(position, col)
+                played.append(col)
+            for player in (HUMAN, AI):
+                assert evaluator.score(player) == position.score(player)
+
+@pytest.mark.parametrize("board", SMALL)
+def test_batch_evaluator_equals_score(board):
+    np = pytest.importorskip("numpy")
+    from connectfour.evaluation import evaluate_bitboards
+    positions = random_positions(4, 50, board=board)
+    for player in (HUMAN, AI):
+        bits = np.array([position.stones(player) for position in positions],
+                        np.uint64)
+        masks = np.array([position.mask for position in positions], np.uint64)
+        scores, wins = evaluate_bitboards(bits, masks, board)
+        assert scores.tolist() == [position.score(player)
+                                   for position in positions]
+        assert wins.tolist() == [position.has_won(player)
+                                 for position in positions]